@@ -0,0 +1,135 @@
+"""
+История времени выполнения тестов SWE-bench по (repo, version).
+
+По истории выводится timeout для нового instance: высокий перцентиль
+успешных прогонов, умноженный на запас, но не больше timeout из CLI.
+Прогоны, упавшие по timeout, хранятся отдельно и в перцентиль не входят —
+иначе один зависший тест раздувал бы timeout для всего репозитория. Но timeout
+после последнего успешного прогона — нижняя граница времени тестов: он
+поднимает оценку, пока успешный прогон не покажет реальное время.
+
+Файл общий для CLI, демона и процессов режима наблюдения: запись идет под
+fcntl.flock с перечитыванием файла, чтобы не затирать чужие прогоны.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: без межпроцессной блокировки
+    fcntl = None
+
+DEFAULT_HISTORY_PATH = '.validator_history.json'
+HISTORY_VERSION = 1
+
+
+class RuntimeHistory:
+    """JSON файл с последними прогонами для каждой пары (repo, version)."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH, max_samples: int = 50,
+                 percentile: float = 0.95, safety_factor: float = 2.0,
+                 min_samples: int = 3, min_timeout: int = 300):
+        self.path = Path(path)
+        self.max_samples = max_samples
+        self.percentile = percentile
+        self.safety_factor = safety_factor
+        self.min_samples = min_samples
+        self.min_timeout = min_timeout
+
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = self._load()
+
+    @staticmethod
+    def _key(repo: str, version: Any) -> str:
+        return f"{repo}@{version}"
+
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            if payload.get('version') == HISTORY_VERSION:
+                return payload.get('entries', {})
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {}
+
+    @contextmanager
+    def _file_lock(self):
+        """Межпроцессная блокировка на соседнем .lock файле."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path.with_name(self.path.name + '.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self):
+        payload = {'version': HISTORY_VERSION, 'entries': self._entries}
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def record(self, repo: str, version: Any, runtime: float, timed_out: bool = False):
+        """Добавляет прогон к актуальному содержимому файла и сохраняет его."""
+        with self._file_lock():
+            # Перечитываем: другие процессы могли записать свои прогоны
+            self._entries = self._load()
+            samples = self._entries.setdefault(self._key(repo, version), [])
+            samples.append({
+                'runtime': round(runtime, 2),
+                'timed_out': timed_out,
+                'recorded_at': time.time(),
+            })
+            del samples[:-self.max_samples]
+            self._save()
+
+    def _samples(self, repo: str, version: Any) -> List[Dict[str, Any]]:
+        """Прогоны (repo, version) из актуального файла, от старых к новым."""
+        # Файл заменяется атомарно, поэтому читать можно без блокировки
+        entries = self._load()
+        with self._lock:
+            self._entries = entries
+            return list(entries.get(self._key(repo, version), []))
+
+    def runtimes(self, repo: str, version: Any) -> List[float]:
+        """Время успешно завершившихся (не по timeout) прогонов."""
+        return [s['runtime'] for s in self._samples(repo, version) if not s.get('timed_out')]
+
+    def timeout_for(self, repo: str, version: Any, ceiling: int) -> int:
+        """
+        Timeout для instance из (repo, version).
+
+        Без достаточной истории возвращает ceiling (значение из CLI).
+        """
+        samples = self._samples(repo, version)
+        runtimes = sorted(s['runtime'] for s in samples if not s.get('timed_out'))
+        if len(runtimes) < self.min_samples:
+            return ceiling
+
+        # Перцентиль по методу ближайшего ранга
+        rank = max(1, math.ceil(self.percentile * len(runtimes)))
+        estimate = math.ceil(runtimes[rank - 1] * self.safety_factor)
+
+        # Timeout после последнего успешного прогона: тесты идут дольше него,
+        # иначе слишком тесный timeout никогда бы не вырос
+        since_success = []
+        for sample in reversed(samples):
+            if not sample.get('timed_out'):
+                break
+            since_success.append(sample['runtime'])
+        if since_success:
+            estimate = max(estimate, math.ceil(max(since_success) * self.safety_factor))
+
+        return min(ceiling, max(self.min_timeout, estimate))
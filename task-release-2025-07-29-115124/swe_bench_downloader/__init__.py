@@ -7,7 +7,18 @@ using the official SWE-bench library and saving them to the local data_points/ f
 
 __version__ = "0.1.0"
 
-from .downloader import SWEBenchDownloader
-from .cli import main
+from .packed_store import PackedDataPointStore
 
-__all__ = ["SWEBenchDownloader", "main"] 
\ No newline at end of file
+__all__ = ["SWEBenchDownloader", "PackedDataPointStore", "main"]
+
+
+def __getattr__(name):
+    # downloader/cli pull in datasets and swebench; import them only on use so
+    # that packed_store stays usable from the validator without those packages.
+    if name == "SWEBenchDownloader":
+        from .downloader import SWEBenchDownloader
+        return SWEBenchDownloader
+    if name == "main":
+        from .cli import main
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
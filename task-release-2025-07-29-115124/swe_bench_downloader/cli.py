@@ -61,6 +61,16 @@ console = Console()
     is_flag=True,
     help="Overwrite existing files",
 )
+@click.option(
+    "--packed",
+    is_flag=True,
+    help="Write a packed store (single JSONL segment + index) into output_dir",
+)
+@click.option(
+    "--compress",
+    is_flag=True,
+    help="Gzip records in a new packed store (with --packed)",
+)
 @click.option(
     "--verbose",
     "-v",
@@ -78,6 +88,8 @@ def main(
     end_idx,
     output_dir,
     force,
+    packed,
+    compress,
     verbose,
 ):
     """
@@ -96,6 +108,9 @@ def main(
     
     # Download specific range
     download_swe_bench.sh --split "test" --start_idx 0 --end_idx 50
+    
+    # Download into a compressed packed store
+    download_swe_bench.sh --repo "django/django" --packed --compress --output_dir packed
     """
     try:
         # Create output directory
@@ -109,6 +124,8 @@ def main(
             output_dir=output_path,
             force_overwrite=force,
             verbose=verbose,
+            packed=packed,
+            compress=compress,
         )
         
         # Build filters
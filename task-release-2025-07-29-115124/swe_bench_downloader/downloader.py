@@ -14,6 +14,8 @@ from rich.console import Console
 from swebench.harness.utils import load_swebench_dataset
 from swebench.harness.constants import SWEbenchInstance, KEY_INSTANCE_ID
 
+from .packed_store import PackedDataPointStore
+
 console = Console()
 logger = logging.getLogger(__name__)
 
@@ -46,6 +48,8 @@ class SWEBenchDownloader:
         output_dir: Path = Path("data_points"),
         force_overwrite: bool = False,
         verbose: bool = False,
+        packed: bool = False,
+        compress: bool = False,
     ):
         """
         Initialize the SWE-bench downloader.
@@ -56,6 +60,9 @@ class SWEBenchDownloader:
             output_dir: Directory to save downloaded data points
             force_overwrite: Whether to overwrite existing files
             verbose: Enable verbose logging
+            packed: Write into a packed store at output_dir instead of one
+                JSON file per instance
+            compress: Gzip records in a newly created packed store
         """
         self.dataset_name = self._normalize_dataset_name(dataset_name)
         self.split = split
@@ -70,6 +77,9 @@ class SWEBenchDownloader:
         # Create output directory
         self.output_dir.mkdir(exist_ok=True)
         
+        # Packed store (single segment + offset index)
+        self.store = PackedDataPointStore(self.output_dir, compress=compress) if packed else None
+        
         # Load dataset
         self.dataset = None
         
@@ -139,7 +149,10 @@ class SWEBenchDownloader:
             filepath = self.output_dir / filename
             
             # Check if file exists and force is not set
-            if filepath.exists() and not self.force_overwrite:
+            if self.store is not None:
+                if instance_id in self.store and not self.force_overwrite:
+                    return False, None
+            elif filepath.exists() and not self.force_overwrite:
                 return False, None  # Skipped, not an error
                 
             # Add metadata
@@ -153,9 +166,12 @@ class SWEBenchDownloader:
                 }
             }
             
-            # Save to file
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(instance_with_metadata, f, indent=2, ensure_ascii=False)
+            # Save to packed store or file
+            if self.store is not None:
+                self.store.put(instance_with_metadata, overwrite=self.force_overwrite)
+            else:
+                with open(filepath, "w", encoding="utf-8") as f:
+                    json.dump(instance_with_metadata, f, indent=2, ensure_ascii=False)
                 
             return True, None
             
@@ -237,6 +253,9 @@ class SWEBenchDownloader:
                 error_details.append(error)
                 if self.verbose:
                     console.print(f"✗ Error: {error}")
+        
+        if self.store is not None:
+            self.store.close()
                     
         return {
             "downloaded": downloaded,
@@ -0,0 +1,396 @@
+"""
+Packed storage for SWE-bench data points.
+
+A packed store is a directory holding a single append-only JSONL segment
+(optionally gzip-compressed) plus an offset index keyed by name:
+
+    store/
+        segment.jsonl      (or segment.jsonl.gz)
+        segment.idx        {"name": [offset, length], ...}
+
+A data point's name is its instance_id. Files imported from a ``data_points/``
+directory are named after the file instead, so variants that share an
+instance_id (``astropy__astropy-11693-fail.json``) survive a round trip; such
+records carry the name in an extra ``_store_name`` field.
+
+Compressed segments are written as one gzip member per record, so the file is
+still a valid ``.jsonl.gz`` stream for ``zcat`` while every record can be
+decompressed on its own. Readers memory-map the segment and slice records
+directly by offset, which avoids scanning thousands of small files.
+
+Readers never modify the segment. A corrupt record is skipped when the index
+is rebuilt, and a torn trailing record (an interrupted writer) is cut off by
+the next ``put()``.
+"""
+
+import gzip
+import json
+import mmap
+import os
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SEGMENT_NAME = "segment.jsonl"
+COMPRESSED_SEGMENT_NAME = "segment.jsonl.gz"
+INDEX_NAME = "segment.idx"
+INDEX_VERSION = 1
+SCAN_CHUNK_SIZE = 16 * 1024
+GZIP_MAGIC = b"\x1f\x8b\x08"
+NAME_FIELD = "_store_name"
+
+
+class PackedDataPointStore:
+    """
+    Single-segment data point store with random access by name.
+    """
+
+    def __init__(self, path: Path, compress: Optional[bool] = None):
+        """
+        Open (or prepare) a packed store.
+
+        Args:
+            path: Store directory
+            compress: Gzip records when creating a new store. Ignored for an
+                existing store, whose segment format always wins.
+        """
+        self.path = Path(path)
+        self.index_path = self.path / INDEX_NAME
+
+        if (self.path / COMPRESSED_SEGMENT_NAME).exists():
+            self.compressed = True
+        elif (self.path / SEGMENT_NAME).exists():
+            self.compressed = False
+        else:
+            self.compressed = bool(compress)
+
+        self.segment_path = self.path / (
+            COMPRESSED_SEGMENT_NAME if self.compressed else SEGMENT_NAME
+        )
+
+        self._index: Optional[Dict[str, Tuple[int, int]]] = None
+        # Segment size the index was built for, and the end of its last
+        # complete record (smaller only if the segment has a torn tail)
+        self._segment_size = 0
+        self._data_end = 0
+        self._segment_file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._dirty = False
+
+    # ------------------------------------------------------------------ index
+
+    @property
+    def index(self) -> Dict[str, Tuple[int, int]]:
+        """Offset index, loaded lazily and rebuilt from the segment if stale."""
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index
+
+    def _load_index(self) -> Dict[str, Tuple[int, int]]:
+        if not self.segment_path.exists():
+            self._segment_size = self._data_end = 0
+            return {}
+
+        segment_size = self.segment_path.stat().st_size
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    payload = json.load(f)
+                if (
+                    payload.get("version") == INDEX_VERSION
+                    and payload.get("segment_size") == segment_size
+                ):
+                    self._segment_size = segment_size
+                    self._data_end = payload.get("data_end", segment_size)
+                    return {
+                        key: (offset, length)
+                        for key, (offset, length) in payload["entries"].items()
+                    }
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+
+        # Missing or out-of-date index (e.g. an interrupted writer): rebuild it.
+        index, data_end = self._scan_segment()
+        self._segment_size = segment_size
+        self._data_end = data_end
+        self._index = index
+        self._dirty = True
+        try:
+            self.flush()
+        except OSError:
+            pass  # Read-only location: keep the rebuilt index in memory
+        return index
+
+    @staticmethod
+    def _read_gzip_member(buf, offset: int) -> Tuple[bytes, int]:
+        """
+        Decompress the gzip member starting at offset.
+
+        The buffer is fed in bounded chunks so that only the member itself
+        (plus at most one chunk) is touched, not the rest of the segment.
+
+        Raises:
+            EOFError: If the member is truncated
+            zlib.error: If the member is corrupt
+        """
+        decompressor = zlib.decompressobj(wbits=31)
+        chunks = []
+        position = offset
+        while not decompressor.eof:
+            if position >= len(buf):
+                raise EOFError("truncated gzip member")
+            chunk = buf[position:position + SCAN_CHUNK_SIZE]
+            chunks.append(decompressor.decompress(chunk))
+            position += len(chunk)
+        end = position - len(decompressor.unused_data)
+        return b"".join(chunks), end - offset
+
+    def _scan_segment(self) -> Tuple[Dict[str, Tuple[int, int]], int]:
+        """
+        Walk the memory-mapped segment record by record.
+
+        A corrupt record is skipped: plain segments move on to the next line,
+        compressed ones to the next gzip header.
+
+        Returns:
+            (index, data_end) where data_end is the offset of a torn trailing
+            record, or the segment size if the segment ends cleanly.
+        """
+        index: Dict[str, Tuple[int, int]] = {}
+        if self.segment_path.stat().st_size == 0:
+            return index, 0
+
+        with open(self.segment_path, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            buf = memoryview(mm)
+            try:
+                offset = 0
+                while offset < len(mm):
+                    if self.compressed:
+                        try:
+                            line, length = self._read_gzip_member(buf, offset)
+                        except (EOFError, zlib.error):
+                            next_member = mm.find(GZIP_MAGIC, offset + 1)
+                            if next_member == -1:
+                                return index, offset  # Torn or corrupt tail
+                            offset = next_member
+                            continue
+                    else:
+                        end = mm.find(b"\n", offset)
+                        if end == -1:
+                            return index, offset  # Truncated trailing line
+                        length = end + 1 - offset
+                        line = bytes(buf[offset:end])
+
+                    try:
+                        record = json.loads(line)
+                        name = record.get(NAME_FIELD, record["instance_id"])
+                        index[name] = (offset, length)
+                    except (ValueError, KeyError, TypeError, AttributeError):
+                        pass
+                    offset += length
+            finally:
+                buf.release()
+
+        return index, offset
+
+    def flush(self):
+        """Persist the index atomically next to the segment."""
+        if not self._dirty or self._index is None:
+            return
+
+        payload = {
+            "version": INDEX_VERSION,
+            "segment": self.segment_path.name,
+            "segment_size": self._segment_size,
+            "data_end": self._data_end,
+            "entries": {key: list(span) for key, span in self._index.items()},
+        }
+        tmp_path = self.index_path.with_suffix(".idx.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = False
+
+    # ---------------------------------------------------------------- reading
+
+    def _open_mmap(self) -> Optional[mmap.mmap]:
+        if self._mmap is None:
+            if not self.segment_path.exists() or self.segment_path.stat().st_size == 0:
+                return None
+            self._segment_file = open(self.segment_path, "rb")
+            self._mmap = mmap.mmap(
+                self._segment_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        return self._mmap
+
+    def _close_mmap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._segment_file is not None:
+            self._segment_file.close()
+            self._segment_file = None
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def ids(self) -> List[str]:
+        """Names in the store, in segment order."""
+        return sorted(self.index, key=lambda key: self.index[key][0])
+
+    def get(self, name: str) -> Dict[str, Any]:
+        """
+        Read a single data point by name (normally its instance_id).
+
+        Raises:
+            KeyError: If the name is not in the store
+        """
+        offset, length = self.index[name]
+        mm = self._open_mmap()
+        if mm is None or offset + length > len(mm):
+            raise KeyError(name)
+
+        raw = mm[offset:offset + length]
+        if self.compressed:
+            raw = gzip.decompress(raw)
+        data = json.loads(raw)
+        data.pop(NAME_FIELD, None)
+        return data
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Iterate over (name, data point) pairs in segment order."""
+        for name in self.ids():
+            yield name, self.get(name)
+
+    # ---------------------------------------------------------------- writing
+
+    def put(
+        self, instance: Dict[str, Any], overwrite: bool = False, name: Optional[str] = None
+    ) -> bool:
+        """
+        Append a data point to the segment.
+
+        A replaced instance is appended again and the index is pointed at the
+        new record; the old bytes stay in the segment until it is repacked.
+
+        Args:
+            instance: Data point
+            overwrite: Replace a data point already stored under the same name
+            name: Store name, defaults to the instance_id
+
+        Returns:
+            True if written, False if skipped because it already exists
+        """
+        name = name or instance["instance_id"]
+        if name in self.index and not overwrite:
+            return False
+
+        if name != instance["instance_id"]:
+            instance = {**instance, NAME_FIELD: name}
+        line = json.dumps(instance, ensure_ascii=False).encode("utf-8") + b"\n"
+        record = gzip.compress(line) if self.compressed else line
+
+        # The mapping is sized at open time, so drop it before growing the file.
+        self._close_mmap()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._drop_torn_tail()
+        with open(self.segment_path, "ab") as f:
+            offset = f.tell()
+            f.write(record)
+
+        self.index[name] = (offset, len(record))
+        self._segment_size = self._data_end = offset + len(record)
+        self._dirty = True
+        return True
+
+    def _drop_torn_tail(self):
+        """Cut off a torn trailing record so the next one is not appended after it."""
+        if not self.segment_path.exists():
+            return
+        if self.segment_path.stat().st_size != self._segment_size:
+            # The segment changed since the index was built: look at it again.
+            self._index = None
+            self._index = self._load_index()
+        if self._data_end < self._segment_size:
+            with open(self.segment_path, "r+b") as f:
+                f.truncate(self._data_end)
+            self._segment_size = self._data_end
+
+    def close(self):
+        """Flush the index and release the memory map."""
+        self.flush()
+        self._close_mmap()
+
+    def __enter__(self) -> "PackedDataPointStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ------------------------------------------------------------- conversion
+
+    def export_to_dir(self, output_dir: Path, force_overwrite: bool = False) -> Dict[str, int]:
+        """
+        Unpack the store into the per-file ``data_points/<name>.json`` layout.
+
+        Returns:
+            Dictionary with export statistics
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        exported = 0
+        skipped = 0
+        for name, data in self.items():
+            filepath = output_dir / f"{name}.json"
+            if filepath.exists() and not force_overwrite:
+                skipped += 1
+                continue
+            with open(filepath, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            exported += 1
+
+        return {"exported": exported, "skipped": skipped}
+
+    def import_from_dir(self, input_dir: Path, force_overwrite: bool = False) -> Dict[str, Any]:
+        """
+        Pack every ``*.json`` data point from a per-file directory into the store.
+
+        Each data point is stored under its file name (without ``.json``), so
+        export_to_dir() recreates the same files.
+
+        Returns:
+            Dictionary with import statistics
+        """
+        imported = 0
+        skipped = 0
+        errors = 0
+        error_details = []
+
+        for filepath in sorted(Path(input_dir).glob("*.json")):
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if self.put(data, overwrite=force_overwrite, name=filepath.stem):
+                    imported += 1
+                else:
+                    skipped += 1
+            except Exception as e:
+                errors += 1
+                error_details.append(f"Failed to import {filepath}: {str(e)}")
+
+        self.flush()
+        return {
+            "imported": imported,
+            "skipped": skipped,
+            "errors": errors,
+            "error_details": error_details,
+        }
@@ -0,0 +1,125 @@
+"""
+Command-line interface for converting between the per-file data_points/ layout
+and a packed store.
+
+Usage:
+    python -m swe_bench_downloader.store_cli import --input_dir data_points --store packed
+    python -m swe_bench_downloader.store_cli export --store packed --output_dir data_points
+"""
+
+import click
+from pathlib import Path
+from rich.console import Console
+import sys
+
+from .packed_store import PackedDataPointStore
+
+console = Console()
+
+
+@click.group()
+def main():
+    """Convert SWE-bench data points to and from a packed store."""
+
+
+@main.command("import")
+@click.option(
+    "--input_dir",
+    default="data_points",
+    help="Directory with one JSON file per instance (default: data_points/)",
+)
+@click.option(
+    "--store",
+    "store_dir",
+    required=True,
+    help="Packed store directory",
+)
+@click.option(
+    "--compress",
+    is_flag=True,
+    help="Gzip records when creating a new store",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Replace instances already in the store",
+)
+@click.option(
+    "--verbose",
+    "-v",
+    is_flag=True,
+    help="Enable verbose output",
+)
+def import_command(input_dir, store_dir, compress, force, verbose):
+    """Pack per-file data points into a packed store."""
+    try:
+        with PackedDataPointStore(Path(store_dir), compress=compress) as store:
+            results = store.import_from_dir(Path(input_dir), force_overwrite=force)
+            total = len(store)
+
+        console.print("\n[bold green]✓ Import completed successfully![/bold green]")
+        console.print(f"[bold]Summary:[/bold]")
+        console.print(f"  • Imported: {results['imported']}")
+        console.print(f"  • Skipped (existing): {results['skipped']}")
+        console.print(f"  • Errors: {results['errors']}")
+        console.print(f"  • Instances in store: {total}")
+
+        if verbose and results["error_details"]:
+            console.print("\n[bold]Error details:[/bold]")
+            for error in results["error_details"]:
+                console.print(f"  • {error}")
+
+    except Exception as e:
+        console.print(f"[bold red]✗ Error: {str(e)}[/bold red]")
+        if verbose:
+            console.print_exception()
+        sys.exit(1)
+
+
+@main.command("export")
+@click.option(
+    "--store",
+    "store_dir",
+    required=True,
+    help="Packed store directory",
+)
+@click.option(
+    "--output_dir",
+    default="data_points",
+    help="Output directory (default: data_points/)",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Overwrite existing files",
+)
+@click.option(
+    "--verbose",
+    "-v",
+    is_flag=True,
+    help="Enable verbose output",
+)
+def export_command(store_dir, output_dir, force, verbose):
+    """Unpack a packed store into one JSON file per instance."""
+    try:
+        if not Path(store_dir).is_dir():
+            raise FileNotFoundError(f"Packed store not found: {store_dir}")
+
+        with PackedDataPointStore(Path(store_dir)) as store:
+            results = store.export_to_dir(Path(output_dir), force_overwrite=force)
+
+        console.print("\n[bold green]✓ Export completed successfully![/bold green]")
+        console.print(f"[bold]Summary:[/bold]")
+        console.print(f"  • Exported: {results['exported']}")
+        console.print(f"  • Skipped (existing): {results['skipped']}")
+        console.print(f"  • Output directory: {output_dir}")
+
+    except Exception as e:
+        console.print(f"[bold red]✗ Error: {str(e)}[/bold red]")
+        if verbose:
+            console.print_exception()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
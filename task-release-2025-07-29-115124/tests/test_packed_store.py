@@ -0,0 +1,197 @@
+import gzip
+import json
+
+import pytest
+
+from swe_bench_downloader.packed_store import (
+    COMPRESSED_SEGMENT_NAME,
+    INDEX_NAME,
+    SEGMENT_NAME,
+    PackedDataPointStore,
+)
+
+
+def make_instance(number, **extra):
+    instance = {
+        "instance_id": f"owner__repo-{number}",
+        "repo": "owner/repo",
+        "patch": "diff --git a/x b/x\n" * number,
+    }
+    instance.update(extra)
+    return instance
+
+
+def fill_store(path, compress, count=4):
+    with PackedDataPointStore(path, compress=compress) as store:
+        for number in range(1, count + 1):
+            store.put(make_instance(number))
+    return path / (COMPRESSED_SEGMENT_NAME if compress else SEGMENT_NAME)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(tmp_path, compress):
+    fill_store(tmp_path, compress)
+
+    store = PackedDataPointStore(tmp_path)
+    assert store.compressed == compress
+    assert store.ids() == [f"owner__repo-{n}" for n in range(1, 5)]
+    assert store.get("owner__repo-3") == make_instance(3)
+    with pytest.raises(KeyError):
+        store.get("owner__repo-9")
+    store.close()
+
+
+def test_compressed_segment_is_a_gzip_stream(tmp_path):
+    segment = fill_store(tmp_path, compress=True)
+
+    lines = gzip.decompress(segment.read_bytes()).decode("utf-8").splitlines()
+    assert [json.loads(line)["instance_id"] for line in lines] == [
+        f"owner__repo-{n}" for n in range(1, 5)
+    ]
+
+
+def test_put_skips_existing_unless_overwrite(tmp_path):
+    with PackedDataPointStore(tmp_path) as store:
+        assert store.put(make_instance(1))
+        assert not store.put(make_instance(1, repo="other/repo"))
+        assert store.put(make_instance(1, repo="other/repo"), overwrite=True)
+
+    store = PackedDataPointStore(tmp_path)
+    assert len(store) == 1
+    assert store.get("owner__repo-1")["repo"] == "other/repo"
+    store.close()
+
+
+def test_fresh_index_is_used_without_scanning(tmp_path, monkeypatch):
+    fill_store(tmp_path, compress=False)
+
+    def fail_scan(self):
+        raise AssertionError("index should not be rebuilt")
+
+    monkeypatch.setattr(PackedDataPointStore, "_scan_segment", fail_scan)
+    store = PackedDataPointStore(tmp_path)
+    assert len(store) == 4
+    store.close()
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_stale_index_is_rebuilt(tmp_path, compress):
+    segment = fill_store(tmp_path, compress)
+    stale_index = (tmp_path / INDEX_NAME).read_bytes()
+
+    with PackedDataPointStore(tmp_path) as store:
+        store.put(make_instance(5))
+    # Simulate a writer that appended but died before flushing its index
+    (tmp_path / INDEX_NAME).write_bytes(stale_index)
+
+    store = PackedDataPointStore(tmp_path)
+    assert "owner__repo-5" in store
+    assert store.get("owner__repo-5") == make_instance(5)
+    store.close()
+
+    payload = json.loads((tmp_path / INDEX_NAME).read_text())
+    assert payload["segment_size"] == segment.stat().st_size
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_reader_does_not_truncate_torn_tail(tmp_path, compress):
+    segment = fill_store(tmp_path, compress)
+    (tmp_path / INDEX_NAME).unlink()
+    with open(segment, "ab") as f:
+        f.write(b"\x1f\x8b\x08\x00partial" if compress else b'{"instance_id": "owner__re')
+    size = segment.stat().st_size
+
+    store = PackedDataPointStore(tmp_path)
+    assert len(store.ids()) == 4
+    store.close()
+    assert segment.stat().st_size == size
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_put_drops_torn_tail(tmp_path, compress):
+    segment = fill_store(tmp_path, compress)
+    clean_size = segment.stat().st_size
+    (tmp_path / INDEX_NAME).unlink()
+    with open(segment, "ab") as f:
+        f.write(b"\x1f\x8b\x08\x00partial" if compress else b'{"instance_id": "owner__re')
+
+    with PackedDataPointStore(tmp_path) as store:
+        store.put(make_instance(5))
+    assert segment.stat().st_size > clean_size
+
+    store = PackedDataPointStore(tmp_path)
+    assert store.ids() == [f"owner__repo-{n}" for n in range(1, 6)]
+    assert store.get("owner__repo-5") == make_instance(5)
+    store.close()
+
+
+def test_corrupt_compressed_record_is_skipped(tmp_path):
+    segment = fill_store(tmp_path, compress=True)
+    (tmp_path / INDEX_NAME).unlink()
+    raw = bytearray(segment.read_bytes())
+    raw[20] ^= 0xFF  # Inside the deflate data of the first member
+    segment.write_bytes(bytes(raw))
+    size = segment.stat().st_size
+
+    store = PackedDataPointStore(tmp_path)
+    assert store.ids() == [f"owner__repo-{n}" for n in range(2, 5)]
+    assert store.get("owner__repo-4") == make_instance(4)
+    store.close()
+    assert segment.stat().st_size == size
+
+    # Appending keeps the skipped bytes but all good records stay readable
+    with PackedDataPointStore(tmp_path) as store:
+        store.put(make_instance(5))
+    store = PackedDataPointStore(tmp_path)
+    assert len(store) == 4
+    store.close()
+
+
+def test_corrupt_plain_line_is_skipped(tmp_path):
+    segment = fill_store(tmp_path, compress=False)
+    (tmp_path / INDEX_NAME).unlink()
+    lines = segment.read_bytes().splitlines(keepends=True)
+    lines[0] = b"{not json" + lines[0][9:]
+    segment.write_bytes(b"".join(lines))
+
+    store = PackedDataPointStore(tmp_path)
+    assert store.ids() == [f"owner__repo-{n}" for n in range(2, 5)]
+    store.close()
+
+
+def test_directory_round_trip_keeps_file_names(tmp_path):
+    source = tmp_path / "data_points"
+    source.mkdir()
+    variants = {
+        "owner__repo-1": make_instance(1),
+        "owner__repo-1-fail": make_instance(1, patch="broken"),
+        "owner__repo-2": make_instance(2),
+    }
+    for name, data in variants.items():
+        (source / f"{name}.json").write_text(json.dumps(data))
+
+    with PackedDataPointStore(tmp_path / "packed", compress=True) as store:
+        results = store.import_from_dir(source)
+    assert results["imported"] == 3
+    assert results["skipped"] == 0
+
+    store = PackedDataPointStore(tmp_path / "packed")
+    assert store.get("owner__repo-1-fail") == variants["owner__repo-1-fail"]
+    exported = tmp_path / "exported"
+    assert store.export_to_dir(exported)["exported"] == 3
+    store.close()
+
+    for name, data in variants.items():
+        assert json.loads((exported / f"{name}.json").read_text()) == data
+
+
+def test_file_names_survive_index_rebuild(tmp_path):
+    with PackedDataPointStore(tmp_path) as store:
+        store.put(make_instance(1), name="owner__repo-1-fail")
+        store.put(make_instance(1))
+    (tmp_path / INDEX_NAME).unlink()
+
+    store = PackedDataPointStore(tmp_path)
+    assert store.ids() == ["owner__repo-1-fail", "owner__repo-1"]
+    assert "_store_name" not in store.get("owner__repo-1-fail")
+    store.close()
@@ -0,0 +1,115 @@
+import json
+import threading
+
+from runtime_history import HISTORY_VERSION, RuntimeHistory
+
+
+def make_history(tmp_path, **kwargs):
+    return RuntimeHistory(str(tmp_path / "history.json"), **kwargs)
+
+
+def test_ceiling_without_enough_samples(tmp_path):
+    history = make_history(tmp_path)
+    history.record("astropy/astropy", "4.3", 100)
+    history.record("astropy/astropy", "4.3", 100)
+
+    assert history.timeout_for("astropy/astropy", "4.3", ceiling=1800) == 1800
+
+
+def test_percentile_with_safety_factor(tmp_path):
+    history = make_history(tmp_path, min_timeout=10)
+    for runtime in (100, 120, 400, 110, 130):
+        history.record("django/django", "3.0", runtime)
+
+    # 95-й перцентиль из 5 прогонов по ближайшему рангу — максимум
+    assert history.timeout_for("django/django", "3.0", ceiling=1800) == 800
+    assert history.timeout_for("django/django", "3.0", ceiling=500) == 500
+
+
+def test_min_timeout(tmp_path):
+    history = make_history(tmp_path)
+    for _ in range(3):
+        history.record("django/django", "3.0", 10)
+
+    assert history.timeout_for("django/django", "3.0", ceiling=1800) == 300
+
+
+def test_keys_are_separate(tmp_path):
+    history = make_history(tmp_path, min_timeout=10)
+    for _ in range(3):
+        history.record("django/django", "3.0", 100)
+
+    assert history.timeout_for("django/django", "3.1", ceiling=1800) == 1800
+    assert history.timeout_for("sympy/sympy", "3.0", ceiling=1800) == 1800
+
+
+def test_timed_out_runs_are_not_runtimes(tmp_path):
+    history = make_history(tmp_path)
+    history.record("astropy/astropy", "4.3", 100)
+    history.record("astropy/astropy", "4.3", 300, timed_out=True)
+
+    assert history.runtimes("astropy/astropy", "4.3") == [100]
+
+
+def test_timeouts_since_last_success_raise_the_estimate(tmp_path):
+    history = make_history(tmp_path)
+    for _ in range(3):
+        history.record("astropy/astropy", "4.3", 100)
+    timeout = history.timeout_for("astropy/astropy", "4.3", ceiling=1800)
+    assert timeout == 300
+
+    # Тесты стали идти дольше: каждый timeout поднимает следующий
+    seen = [timeout]
+    for _ in range(10):
+        history.record("astropy/astropy", "4.3", timeout, timed_out=True)
+        timeout = history.timeout_for("astropy/astropy", "4.3", ceiling=1800)
+        seen.append(timeout)
+    assert seen[:4] == [300, 600, 1200, 1800]
+    assert timeout == 1800
+
+    # Успешный прогон показывает реальное время
+    history.record("astropy/astropy", "4.3", 700)
+    assert history.timeout_for("astropy/astropy", "4.3", ceiling=1800) == 1400
+
+
+def test_single_hang_does_not_inflate_after_success(tmp_path):
+    history = make_history(tmp_path)
+    for _ in range(3):
+        history.record("astropy/astropy", "4.3", 100)
+    history.record("astropy/astropy", "4.3", 1800, timed_out=True)
+    history.record("astropy/astropy", "4.3", 100)
+
+    assert history.timeout_for("astropy/astropy", "4.3", ceiling=1800) == 300
+
+
+def test_max_samples(tmp_path):
+    history = make_history(tmp_path, max_samples=5)
+    for runtime in range(10):
+        history.record("django/django", "3.0", runtime)
+
+    assert history.runtimes("django/django", "3.0") == [5, 6, 7, 8, 9]
+
+
+def test_unknown_file_version_is_ignored(tmp_path):
+    path = tmp_path / "history.json"
+    path.write_text(json.dumps({"version": HISTORY_VERSION + 1, "entries": {"x@1": []}}))
+
+    history = RuntimeHistory(str(path))
+    assert history.runtimes("x", "1") == []
+
+
+def test_concurrent_instances_keep_all_samples(tmp_path):
+    histories = [make_history(tmp_path) for _ in range(4)]
+
+    def write(history):
+        for _ in range(20):
+            history.record("django/django", "3.0", 100)
+
+    threads = [threading.Thread(target=write, args=(h,)) for h in histories]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(make_history(tmp_path).runtimes("django/django", "3.0")) == 50
+    assert len(histories[0].runtimes("django/django", "3.0")) == 50
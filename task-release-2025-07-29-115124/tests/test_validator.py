@@ -0,0 +1,302 @@
+import json
+import sys
+import threading
+import time
+import types
+from pathlib import Path
+
+import pytest
+
+import validator
+from runtime_history import RuntimeHistory
+from validator import (
+    FAILURE_DATA_POINT,
+    FAILURE_INFRA,
+    MODEL_NAME,
+    SWEBenchValidator,
+    summarize_results,
+)
+
+
+def make_data_point(number):
+    return {
+        "instance_id": f"owner__repo-{number}",
+        "repo": "owner/repo",
+        "base_commit": "a" * 40,
+        "patch": "diff --git a/x b/x\n",
+        "test_patch": "diff --git a/t b/t\n",
+        "problem_statement": "problem",
+        "hints_text": "",
+        "created_at": "2024-01-01T00:00:00Z",
+        "version": "1.0",
+        "FAIL_TO_PASS": ["test_a"],
+        "PASS_TO_PASS": [],
+    }
+
+
+class FakeHarness:
+    """
+    Подмена swebench.harness.run_evaluation.main: каждый вызов берет
+    следующий исход из outcomes[instance_id] и пишет отчет и run_instance.log
+    так же, как harness.
+    """
+
+    def __init__(self, log_dir: Path, outcomes):
+        self.log_dir = log_dir
+        self.outcomes = {key: list(value) for key, value in outcomes.items()}
+        self.calls = []
+        self.events = []
+
+    def main(self, **kwargs):
+        instance_id = kwargs["instance_ids"][0]
+        self.calls.append((instance_id, kwargs["timeout"]))
+        self.events.append(("harness", instance_id))
+        outcome = self.outcomes[instance_id].pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+
+        log_lines = {
+            "resolved": "Test runtime: 12.5 seconds",
+            "unresolved": "Test runtime: 12.5 seconds",
+            "timeout": f"Test timed out after {kwargs['timeout']} seconds.",
+            "infra": "docker.errors.APIError: 500 Server Error: Internal Server Error",
+        }
+        log_file = (
+            self.log_dir / kwargs["run_id"] / MODEL_NAME / instance_id / "run_instance.log"
+        )
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        log_file.write_text(log_lines[outcome])
+
+        report = {
+            "total_instances": 1,
+            "resolved_instances": int(outcome == "resolved"),
+            "resolved_ids": [instance_id] if outcome == "resolved" else [],
+            "completed_ids": [instance_id] if outcome in ("resolved", "unresolved") else [],
+            "error_ids": [instance_id] if outcome in ("timeout", "infra") else [],
+        }
+        report_path = Path(kwargs["report_dir"]) / f"{kwargs['run_id']}.json"
+        report_path.write_text(json.dumps(report))
+        return str(report_path)
+
+
+@pytest.fixture
+def harness(tmp_path, monkeypatch):
+    fake = FakeHarness(tmp_path / "logs", {})
+
+    run_evaluation = types.ModuleType("swebench.harness.run_evaluation")
+    run_evaluation.main = fake.main
+    constants = types.ModuleType("swebench.harness.constants")
+    constants.RUN_EVALUATION_LOG_DIR = str(fake.log_dir)
+    for name, module in {
+        "swebench": types.ModuleType("swebench"),
+        "swebench.harness": types.ModuleType("swebench.harness"),
+        "swebench.harness.run_evaluation": run_evaluation,
+        "swebench.harness.constants": constants,
+    }.items():
+        monkeypatch.setitem(sys.modules, name, module)
+
+    def ensure_instance_image(self, data, result):
+        fake.events.append(("image", data["instance_id"]))
+
+    original_collect = SWEBenchValidator._collect_report
+
+    def collect_report(self, report_path, temp_dir, data, result):
+        fake.events.append(("report", data["instance_id"]))
+        return original_collect(self, report_path, temp_dir, data, result)
+
+    monkeypatch.setattr(SWEBenchValidator, "ensure_instance_image", ensure_instance_image)
+    monkeypatch.setattr(SWEBenchValidator, "_collect_report", collect_report)
+    return fake
+
+
+@pytest.fixture
+def write_points(tmp_path):
+    def write(*numbers):
+        paths = []
+        for number in numbers:
+            path = tmp_path / f"owner__repo-{number}.json"
+            path.write_text(json.dumps(make_data_point(number)))
+            paths.append(str(path))
+        return paths
+
+    return write
+
+
+def make_validator(**kwargs):
+    kwargs.setdefault("retry_backoff", 0)
+    return SWEBenchValidator(**kwargs)
+
+
+def test_resolved_instance_is_valid(harness, write_points):
+    harness.outcomes["owner__repo-1"] = ["resolved"]
+    [path] = write_points(1)
+
+    result = make_validator().validate_data_point(path)
+
+    assert result["valid"]
+    assert result["failure_kind"] is None
+    assert result["swe_bench_evaluation"]["runtime"] == 12.5
+
+
+def test_completed_but_unresolved_is_an_invalid_data_point(harness, write_points):
+    harness.outcomes["owner__repo-1"] = ["unresolved"]
+    paths = write_points(1)
+
+    batch = make_validator().validate_batch(paths)
+    [result] = batch["results"]
+
+    assert not result["valid"]
+    assert result["failure_kind"] == FAILURE_DATA_POINT
+    assert any("не resolved" in error for error in result["errors"])
+    assert batch["summary"]["data_point_failures"] == 1
+    assert batch["summary"]["valid"] == 0
+    assert len(harness.calls) == 1
+
+
+def test_infra_failure_is_retried(harness, write_points):
+    harness.outcomes["owner__repo-1"] = ["infra", "resolved"]
+    [path] = write_points(1)
+
+    result = make_validator().validate_data_point(path)
+
+    assert result["valid"]
+    assert result["retries"] == 1
+    assert len(harness.calls) == 2
+
+
+def test_infra_failure_stops_at_max_retries(harness, write_points):
+    harness.outcomes["owner__repo-1"] = ["infra"] * 3
+    [path] = write_points(1)
+
+    result = make_validator(max_retries=2).validate_data_point(path)
+
+    assert not result["valid"]
+    assert result["failure_kind"] == FAILURE_INFRA
+    assert result["retries"] == 2
+    assert len(harness.calls) == 3
+
+
+def test_retry_budget_is_shared_by_the_batch(harness, write_points):
+    harness.outcomes["owner__repo-1"] = ["infra", "infra"]
+    harness.outcomes["owner__repo-2"] = ["infra"]
+    paths = write_points(1, 2)
+
+    batch = make_validator(max_retries=2, retry_budget=1).validate_batch(paths)
+
+    assert batch["summary"]["infra_failures"] == 2
+    assert batch["summary"]["retries"] == 1
+    assert len(harness.calls) == 3
+
+
+def test_docker_exception_is_infra(harness, write_points):
+    docker_error = type("APIError", (Exception,), {"__module__": "docker.errors"})
+    harness.outcomes["owner__repo-1"] = [docker_error("daemon gone"), "resolved"]
+    [path] = write_points(1)
+
+    result = make_validator().validate_data_point(path)
+
+    assert result["valid"]
+    assert result["retries"] == 1
+
+
+def test_other_exception_is_data_point(harness, write_points):
+    harness.outcomes["owner__repo-1"] = [ValueError("bad patch")]
+    [path] = write_points(1)
+
+    result = make_validator().validate_data_point(path)
+
+    assert not result["valid"]
+    assert result["failure_kind"] == FAILURE_DATA_POINT
+    assert len(harness.calls) == 1
+
+
+def test_timeout_at_ceiling_is_not_retried(harness, write_points):
+    harness.outcomes["owner__repo-1"] = ["timeout"]
+    [path] = write_points(1)
+
+    result = make_validator(timeout=1800).validate_data_point(path)
+
+    assert not result["valid"]
+    assert result["timed_out"]
+    assert result["failure_kind"] == FAILURE_DATA_POINT
+    assert harness.calls == [("owner__repo-1", 1800)]
+
+
+def test_adaptive_timeout_is_retried_with_ceiling(harness, write_points, tmp_path):
+    history = RuntimeHistory(str(tmp_path / "history.json"))
+    for _ in range(3):
+        history.record("owner/repo", "1.0", 100)
+    harness.outcomes["owner__repo-1"] = ["timeout", "resolved"]
+    paths = write_points(1)
+
+    batch = make_validator(timeout=1800, history=history).validate_batch(paths)
+    [result] = batch["results"]
+
+    assert result["valid"]
+    assert not result["timed_out"]
+    assert harness.calls == [("owner__repo-1", 300), ("owner__repo-1", 1800)]
+    assert result["retries"] == 0
+
+
+def test_cancel_event_interrupts_retry_wait(harness, write_points):
+    harness.outcomes["owner__repo-1"] = ["infra", "resolved"]
+    paths = write_points(1)
+    cancel_event = threading.Event()
+    checker = make_validator(retry_backoff=60, cancel_event=cancel_event)
+
+    threading.Timer(0.2, cancel_event.set).start()
+    started_at = time.monotonic()
+    batch = checker.validate_batch(paths)
+
+    assert time.monotonic() - started_at < 10
+    [result] = batch["results"]
+    assert not result["valid"]
+    assert "Повтор отменен" in result["swe_bench_evaluation"]["logs"]
+    assert len(harness.calls) == 1
+
+
+def test_pipeline_keeps_order_and_stage_sequence(harness, write_points, tmp_path):
+    for number in (1, 2, 3):
+        harness.outcomes[f"owner__repo-{number}"] = ["resolved"]
+    broken = tmp_path / "broken.json"
+    broken.write_text(json.dumps({"instance_id": "broken"}))
+    paths = write_points(1, 2)
+    paths.insert(1, str(broken))
+    paths += write_points(3)
+
+    batch = make_validator(eval_workers=2, image_workers=2).validate_batch(paths)
+
+    assert [r["file"] for r in batch["results"]] == paths
+    assert [r["valid"] for r in batch["results"]] == [True, False, True, True]
+    assert batch["results"][1]["swe_bench_evaluation"] is None
+    for number in (1, 2, 3):
+        instance_id = f"owner__repo-{number}"
+        stages = [stage for stage, key in harness.events if key == instance_id]
+        assert stages == ["image", "harness", "report"]
+    assert "broken" not in [key for _, key in harness.events]
+
+
+def test_no_evaluation_checks_structure_only(harness, write_points):
+    paths = write_points(1)
+
+    batch = make_validator().validate_batch(paths, run_evaluation=False)
+
+    assert batch["summary"]["valid"] == 1
+    assert harness.calls == []
+
+
+def test_summarize_results_counts_failure_kinds():
+    results = [
+        {"valid": True},
+        {"valid": False, "failure_kind": FAILURE_INFRA, "retries": 2},
+        {"valid": False, "failure_kind": FAILURE_DATA_POINT, "timed_out": True},
+    ]
+
+    summary = summarize_results(results)
+
+    assert summary["total"] == 3
+    assert summary["valid"] == 1
+    assert summary["infra_failures"] == 1
+    assert summary["data_point_failures"] == 1
+    assert summary["timed_out"] == 1
+    assert summary["retries"] == 2
@@ -3,32 +3,136 @@
 SWE-bench Data Point Validator с ПРАВИЛЬНЫМ SWE-bench API
 """
 
+import asyncio
 import json
+import shutil
 import sys
 import argparse
 import tempfile
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import logging
+import re
+import threading
+import time
 
-from swebench.harness.run_evaluation import main as run_evaluation_main
-from swebench.harness.utils import load_swebench_dataset
+from runtime_history import RuntimeHistory, DEFAULT_HISTORY_PATH
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+VALIDATOR_SCRIPT = Path(__file__).resolve()
+
+# Параметры образов для swebench.harness (namespace — образы с Docker Hub)
+HARNESS_NAMESPACE = 'swebench'
+INSTANCE_IMAGE_TAG = 'latest'
+MODEL_NAME = 'golden_patch_validator'
+
+# Маркеры в логах swebench.harness (run_instance.log)
+TEST_RUNTIME_PATTERN = re.compile(r"Test runtime: ([\d_.]+) seconds")
+TEST_TIMEOUT_MARKER = "Test timed out after"
+
+# Признаки инфраструктурных сбоев (Docker daemon, registry, сеть) в логах
+# harness и в исключениях. Такие ошибки не говорят о качестве data point
+# и повторяются автоматически.
+INFRA_FAILURE_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r"Cannot connect to the Docker daemon",
+        r"Error while fetching server API version",
+        r"docker\.errors\.APIError",
+        r"\b50[0234] Server Error",
+        r"toomanyrequests|rate limit exceeded",
+        r"TLS handshake timeout",
+        r"net/http: request canceled",
+        r"i/o timeout",
+        r"Connection (reset by peer|refused|aborted)",
+        r"Read timed out",
+        r"Temporary failure in name resolution",
+        r"Could not resolve host",
+        r"unexpected EOF",
+        r"No such container",
+        r"container \S+ is not running",
+    )
+]
+
+FAILURE_INFRA = 'infra'
+FAILURE_DATA_POINT = 'data_point'
+
+
+def summarize_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Сводная статистика по результатам валидации."""
+    valid_count = sum(1 for r in results if r['valid'])
+    total_count = len(results)
+    
+    return {
+        'total': total_count,
+        'valid': valid_count,
+        'invalid': total_count - valid_count,
+        'timed_out': sum(1 for r in results if r.get('timed_out')),
+        'infra_failures': sum(1 for r in results if r.get('failure_kind') == FAILURE_INFRA),
+        'data_point_failures': sum(1 for r in results if r.get('failure_kind') == FAILURE_DATA_POINT),
+        'retries': sum(r.get('retries', 0) for r in results),
+        'success_rate': valid_count / total_count if total_count > 0 else 0
+    }
+
 
 class SWEBenchValidator:
     """Валидатор с правильным SWE-bench evaluation API."""
     
-    def __init__(self, timeout: int = 1800):
+    def __init__(self, timeout: int = 1800, store_path: Optional[str] = None,
+                 eval_workers: int = 1, image_workers: int = 2,
+                 history: Optional[RuntimeHistory] = None,
+                 max_retries: int = 2, retry_budget: int = 5, retry_backoff: float = 30.0,
+                 docker_client=None, known_images: Optional[set] = None,
+                 run_id: Optional[str] = None,
+                 cancel_event: Optional[threading.Event] = None):
         self.required_fields = [
             'instance_id', 'repo', 'base_commit', 'patch', 
             'test_patch', 'problem_statement', 'hints_text', 
             'created_at', 'version', 'FAIL_TO_PASS', 'PASS_TO_PASS'
         ]
         self.timeout = timeout
+        
+        # История прогонов для адаптивных timeout; self.timeout — потолок
+        self.history = history
+        
+        # Повторы при инфраструктурных сбоях: лимит на instance и общий
+        # бюджет на весь запуск, задержка растет экспоненциально
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._retry_budget_left = retry_budget
+        self._retry_lock = threading.Lock()
+        
+        # Установка события прерывает ожидание перед повтором (демон, отмена job)
+        self.cancel_event = cancel_event or threading.Event()
+        
+        # Параллелизм стадий конвейера validate_batch
+        self.eval_workers = max(1, eval_workers)
+        self.image_workers = max(1, image_workers)
+        
+        # Docker client и множество уже локальных images можно передать
+        # снаружи (демон держит их прогретыми между jobs)
+        self._docker_client = docker_client
+        self.known_images = known_images if known_images is not None else set()
+        
+        # Префикс run_id harness: по нему снаружи находят контейнеры прогона
+        self.run_id = run_id or 'validator'
+        
+        # Packed store: data points адресуются по instance_id вместо пути к файлу
+        self.store = None
+        if store_path:
+            from swe_bench_downloader.packed_store import PackedDataPointStore
+            self.store = PackedDataPointStore(Path(store_path))
+    
+    def load_data_point(self, data_point_path: str) -> Dict[str, Any]:
+        """Загружает data point из packed store (по instance_id) или из JSON файла."""
+        if self.store is not None and data_point_path in self.store:
+            return self.store.get(data_point_path)
+        
+        with open(data_point_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
     
     def validate_json_structure(self, data: Dict[str, Any]) -> List[str]:
         """Проверяет структуру JSON на наличие обязательных полей."""
@@ -64,101 +168,344 @@ class SWEBenchValidator:
             
         return errors
 
-    def run_swebench_evaluation(self, data_point_path: str) -> Dict[str, Any]:
-        """
-        ПРАВИЛЬНАЯ валидация через swebench.harness.run_evaluation.main
-        """
-        result = {
+    def _new_evaluation_result(self) -> Dict[str, Any]:
+        return {
             'evaluation_success': False,
             'patch_applied': False,
             'tests_passed': False,
             'fail_to_pass_results': {},
             'pass_to_pass_results': {},
+            'timed_out': False,
+            'timeout': None,
+            'runtime': None,
+            'run_id': None,
+            'failure_kind': None,
+            'retries': 0,
+            'ceiling_retry': False,
             'errors': [],
             'logs': []
         }
+    
+    def timeout_for(self, data: Dict[str, Any]) -> int:
+        """Timeout для instance: из истории (repo, version), не больше self.timeout."""
+        if self.history is None:
+            return self.timeout
+        return self.history.timeout_for(data['repo'], data['version'], ceiling=self.timeout)
+    
+    def _get_docker_client(self):
+        if self._docker_client is None:
+            import docker
+            self._docker_client = docker.from_env()
+        return self._docker_client
+    
+    def ensure_instance_image(self, data: Dict[str, Any], result: Dict[str, Any]):
+        """
+        Заранее подтягивает instance image, чтобы evaluation не ждал docker pull.
+        Ошибки не фатальны: недостающий image соберет сам harness.
+        """
+        try:
+            import docker
+            from swebench.harness.test_spec.test_spec import make_test_spec
+            
+            client = self._get_docker_client()
+            test_spec = make_test_spec(
+                data, namespace=HARNESS_NAMESPACE, instance_image_tag=INSTANCE_IMAGE_TAG
+            )
+            image_key = test_spec.instance_image_key
+            
+            if image_key not in self.known_images:
+                try:
+                    client.images.get(image_key)
+                except docker.errors.ImageNotFound:
+                    result['logs'].append(f"Скачиваем image {image_key}...")
+                    client.images.pull(image_key)
+                self.known_images.add(image_key)
+            
+            result['logs'].append(f"✓ Image готов: {image_key}")
+        except Exception as e:
+            result['logs'].append(f"Image не подготовлен заранее ({e}), его соберет evaluation")
+    
+    def _prepare_harness_inputs(self, data: Dict[str, Any], temp_dir: Path, result: Dict[str, Any]):
+        """Создает dataset/predictions JSONL и каталог отчетов для harness."""
+        instance_id = data['instance_id']
+        result['logs'].append(f"Начинаем SWE-bench evaluation для {instance_id}")
+        
+        # Создаем предикт в формате SWE-bench
+        # Используем golden patch как решение для валидации
+        prediction = {
+            'instance_id': instance_id,
+            'model_patch': data['patch'],  # Golden patch
+            'model_name_or_path': MODEL_NAME
+        }
+        
+        # Создаем датасет JSONL файл
+        dataset_file = temp_dir / 'dataset.jsonl'
+        with open(dataset_file, 'w') as f:
+            json.dump(data, f)
+            f.write('\n')
+        
+        # Создаем предикты JSONL файл
+        predictions_file = temp_dir / 'predictions.jsonl'
+        with open(predictions_file, 'w') as f:
+            json.dump(prediction, f)
+            f.write('\n')
+        
+        report_dir = temp_dir / 'reports'
+        report_dir.mkdir()
+    
+    def _run_harness(self, data: Dict[str, Any], temp_dir: Path, result: Dict[str, Any]) -> Optional[str]:
+        """Блокирующий запуск swebench.harness.run_evaluation.main. Возвращает путь к отчету."""
+        # Импорт swebench дорогой: откладываем до первого evaluation,
+        # чтобы --no-evaluation и клиент демона стартовали быстро
+        from swebench.harness.run_evaluation import main as run_evaluation_main
+        
+        run_id = f"{self.run_id}_{uuid.uuid4().hex[:8]}"
+        timeout = self.timeout if result['ceiling_retry'] else self.timeout_for(data)
+        result['run_id'] = run_id
+        result['timeout'] = timeout
+        result['timed_out'] = False
+        result['runtime'] = None
+        
+        result['logs'].append(f"Запускаем официальный SWE-bench evaluation (timeout {timeout} с)...")
+        started_at = time.monotonic()
         
+        report_path = run_evaluation_main(
+            dataset_name=str(temp_dir / 'dataset.jsonl'),
+            split='test',
+            instance_ids=[data['instance_id']],
+            predictions_path=str(temp_dir / 'predictions.jsonl'),
+            max_workers=1,
+            force_rebuild=False,
+            cache_level='env',
+            clean=False,
+            open_file_limit=4096,
+            run_id=run_id,
+            timeout=timeout,
+            namespace=HARNESS_NAMESPACE,
+            rewrite_reports=False,
+            modal=False,
+            instance_image_tag=INSTANCE_IMAGE_TAG,
+            report_dir=str(temp_dir / 'reports')
+        )
+        
+        result['logs'].append(f"✓ SWE-bench evaluation завершен, отчет: {report_path}")
+        self._record_runtime(data, result, time.monotonic() - started_at)
+        return report_path
+    
+    def remove_run_containers(self, instance_id: str, run_id: Optional[str] = None):
+        """
+        Удаляет контейнеры прерванного прогона. Фильтр по префиксу run_id,
+        чтобы не задеть другие прогоны того же instance.
+        """
+        name = f"sweb.eval.{instance_id}.{run_id or self.run_id}_"
+        try:
+            client = self._get_docker_client()
+            for container in client.containers.list(all=True, filters={'name': name}):
+                container.remove(force=True)
+        except Exception as e:
+            logger.warning(f"Не удалось удалить контейнеры {name}*: {e}")
+    
+    def close(self):
+        """Освобождает packed store (файл и mmap)."""
+        if self.store is not None:
+            self.store.close()
+    
+    def _harness_log_dir(self, run_id: str, instance_id: str) -> Path:
+        from swebench.harness.constants import RUN_EVALUATION_LOG_DIR
+        return Path(RUN_EVALUATION_LOG_DIR) / run_id / MODEL_NAME / instance_id
+    
+    def _read_harness_log(self, run_id: Optional[str], instance_id: str) -> str:
+        if run_id is None:
+            return ''
+        log_file = self._harness_log_dir(run_id, instance_id) / 'run_instance.log'
         try:
-            with open(data_point_path, 'r') as f:
-                data = json.load(f)
+            return log_file.read_text(encoding='utf-8', errors='replace')
+        except OSError:
+            return ''
+    
+    def _record_runtime(self, data: Dict[str, Any], result: Dict[str, Any], wall_time: float):
+        """Определяет время тестов и timeout по логам harness и пишет их в историю."""
+        log_text = self._read_harness_log(result['run_id'], data['instance_id'])
+        
+        result['runtime'] = None
+        result['timed_out'] = TEST_TIMEOUT_MARKER in log_text
+        match = TEST_RUNTIME_PATTERN.search(log_text)
+        if match:
+            result['runtime'] = float(match.group(1).replace('_', ''))
+        elif result['timed_out']:
+            result['runtime'] = float(result['timeout'])
+        
+        if result['timed_out']:
+            result['logs'].append(f"⏱ Тесты превысили timeout {result['timeout']} с")
+        
+        # Без времени тестов (например, упала сборка image) в историю не пишем
+        if self.history is not None and result['runtime'] is not None:
+            self.history.record(
+                data['repo'], data['version'], result['runtime'], timed_out=result['timed_out']
+            )
+        elif result['runtime'] is None:
+            result['logs'].append(f"Время тестов не найдено в логах (wall time {wall_time:.0f} с)")
+    
+    def _find_report(self, report_path: Optional[str], temp_dir: Path) -> Optional[Dict[str, Any]]:
+        """Первый читаемый отчет harness, без разбора."""
+        candidates = [Path(report_path)] if report_path else []
+        candidates.extend((temp_dir / 'reports').glob('**/*.json'))
+        
+        for candidate in candidates:
+            try:
+                with open(candidate, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                continue
+        return None
+    
+    def classify_failure(self, data: Dict[str, Any], result: Dict[str, Any], temp_dir: Path,
+                         report_path: Optional[str], exc: Optional[BaseException] = None) -> Optional[str]:
+        """
+        Классифицирует исход попытки evaluation.
+        
+        Returns:
+            None — instance resolved,
+            FAILURE_INFRA — сбой Docker/registry/сети,
+            FAILURE_DATA_POINT — проблема самого data point: тесты не прошли
+            с golden patch, timeout тестов, патч не применился
+        """
+        instance_id = data['instance_id']
+        
+        if exc is not None:
+            if type(exc).__module__.split('.')[0] in ('docker', 'requests', 'urllib3'):
+                return FAILURE_INFRA
+            text = f"{type(exc).__name__}: {exc}"
+        else:
+            report_data = self._find_report(report_path, temp_dir) or {}
+            if instance_id in report_data.get('resolved_ids', []):
+                return None
+            if (instance_id in report_data.get('completed_ids', [])
+                    and instance_id not in report_data.get('error_ids', [])):
+                return FAILURE_DATA_POINT  # Completed, но не resolved
+            if result.get('timed_out'):
+                return FAILURE_DATA_POINT
+            text = self._read_harness_log(result.get('run_id'), instance_id)
+        
+        if any(pattern.search(text) for pattern in INFRA_FAILURE_PATTERNS):
+            return FAILURE_INFRA
+        return FAILURE_DATA_POINT
+    
+    def _retry_delay(self, data: Dict[str, Any], result: Dict[str, Any], temp_dir: Path,
+                     report_path: Optional[str], exc: Optional[BaseException] = None) -> Optional[float]:
+        """
+        Решает, повторять ли попытку. Возвращает задержку перед повтором
+        или None, если результат окончательный.
+        
+        Повторяются инфраструктурные сбои (с лимитом и бюджетом) и, один раз
+        и сразу, timeout тестов, если timeout из истории был ниже потолка.
+        """
+        result['failure_kind'] = self.classify_failure(data, result, temp_dir, report_path, exc)
+        if self.cancel_event.is_set():
+            return None
+        
+        if (result['failure_kind'] == FAILURE_DATA_POINT and result.get('timed_out')
+                and not result['ceiling_retry'] and result['timeout'] < self.timeout):
+            # Timeout из истории мог оказаться слишком тесным: это еще не вина data point
+            result['ceiling_retry'] = True
+            result['logs'].append(
+                f"Тесты не уложились в timeout из истории ({result['timeout']} с), "
+                f"повтор с timeout {self.timeout} с"
+            )
+            return 0.0
+        
+        if result['failure_kind'] != FAILURE_INFRA:
+            return None
+        
+        if result['retries'] >= self.max_retries:
+            result['logs'].append(f"Инфраструктурный сбой, лимит повторов ({self.max_retries}) исчерпан")
+            return None
+        with self._retry_lock:
+            if self._retry_budget_left <= 0:
+                result['logs'].append("Инфраструктурный сбой, общий бюджет повторов исчерпан")
+                return None
+            self._retry_budget_left -= 1
+        
+        result['retries'] += 1
+        delay = self.retry_backoff * 2 ** (result['retries'] - 1)
+        result['logs'].append(
+            f"Инфраструктурный сбой, повтор {result['retries']}/{self.max_retries} через {delay:.0f} с"
+        )
+        logger.warning(f"{data['instance_id']}: инфраструктурный сбой, повтор через {delay:.0f} с")
+        return delay
+    
+    def _run_harness_with_retries(self, data: Dict[str, Any], temp_dir: Path,
+                                  result: Dict[str, Any]) -> Optional[str]:
+        """
+        Блокирующий запуск harness с повторами по _retry_delay. Ожидание перед
+        повтором прерывается self.cancel_event. Возвращает путь к отчету,
+        исключение последней попытки пробрасывается.
+        """
+        while True:
+            report_path, exc = None, None
+            try:
+                report_path = self._run_harness(data, temp_dir, result)
+            except Exception as e:
+                exc = e
             
-            instance_id = data['instance_id']
-            result['logs'].append(f"Начинаем SWE-bench evaluation для {instance_id}")
+            delay = self._retry_delay(data, result, temp_dir, report_path, exc)
+            if delay is None:
+                break
+            if self.cancel_event.wait(delay):
+                result['logs'].append("Повтор отменен")
+                break
             
-            # Создаем предикт в формате SWE-bench
-            # Используем golden patch как решение для валидации
-            prediction = {
-                'instance_id': instance_id,
-                'model_patch': data['patch'],  # Golden patch
-                'model_name_or_path': 'golden_patch_validator'
-            }
+            # Отчеты неудачной попытки не должны попасть в разбор следующей
+            for stale in (temp_dir / 'reports').glob('**/*.json'):
+                stale.unlink()
+        
+        if exc is not None:
+            raise exc
+        return report_path
+    
+    def _collect_report(self, report_path: Optional[str], temp_dir: Path, data: Dict[str, Any], result: Dict[str, Any]):
+        """Находит и парсит отчет harness."""
+        instance_id = data['instance_id']
+        
+        if report_path and Path(report_path).exists():
+            with open(report_path, 'r') as f:
+                report_data = json.load(f)
+            
+            # Парсим результат в формате SWE-bench evaluation
+            self._parse_swebench_report(report_data, instance_id, data, result)
+        else:
+            result_files = list((temp_dir / 'reports').glob('**/*.json'))
+            result['logs'].append(f"Найдено файлов результатов: {len(result_files)}")
+            
+            for result_file in result_files:
+                try:
+                    with open(result_file, 'r') as f:
+                        file_data = json.load(f)
+                    
+                    self._parse_swebench_report(file_data, instance_id, data, result)
+                    break  # Выходим после первого найденного результата
+                except Exception as e:
+                    result['logs'].append(f"Ошибка чтения {result_file}: {e}")
+        
+        result['evaluation_success'] = len(result['errors']) == 0
+
+    def run_swebench_evaluation(self, data_point_path: str) -> Dict[str, Any]:
+        """
+        ПРАВИЛЬНАЯ валидация через swebench.harness.run_evaluation.main
+        """
+        result = self._new_evaluation_result()
+        
+        try:
+            data = self.load_data_point(data_point_path)
+            self.ensure_instance_image(data, result)
             
             with tempfile.TemporaryDirectory() as temp_dir:
                 temp_dir = Path(temp_dir)
-                
-                # Создаем датасет JSONL файл
-                dataset_file = temp_dir / 'dataset.jsonl'
-                with open(dataset_file, 'w') as f:
-                    json.dump(data, f)
-                    f.write('\n')
-                
-                # Создаем предикты JSONL файл
-                predictions_file = temp_dir / 'predictions.jsonl'
-                with open(predictions_file, 'w') as f:
-                    json.dump(prediction, f)
-                    f.write('\n')
-                
-                report_dir = temp_dir / 'reports'
-                report_dir.mkdir()
-                
-                run_id = f"validator_{uuid.uuid4().hex[:8]}"
-                
-                result['logs'].append("Запускаем официальный SWE-bench evaluation...")
+                self._prepare_harness_inputs(data, temp_dir, result)
                 
                 try:
-                    report_path = run_evaluation_main(
-                        dataset_name=str(dataset_file),
-                        split='test',
-                        instance_ids=[instance_id],
-                        predictions_path=str(predictions_file),
-                        max_workers=1,
-                        force_rebuild=False,
-                        cache_level='env',
-                        clean=False,
-                        open_file_limit=4096,
-                        run_id=run_id,
-                        timeout=self.timeout,
-                        namespace='swebench',
-                        rewrite_reports=False,
-                        modal=False,
-                        instance_image_tag='latest',
-                        report_dir=str(report_dir)
-                    )
-                    
-                    result['logs'].append(f"✓ SWE-bench evaluation завершен, отчет: {report_path}")
-                    
-                    if report_path and Path(report_path).exists():
-                        with open(report_path, 'r') as f:
-                            report_data = json.load(f)
-                        
-                        # Парсим результат в формате SWE-bench evaluation
-                        self._parse_swebench_report(report_data, instance_id, data, result)
-                    else:
-                        result_files = list(report_dir.glob('**/*.json'))
-                        result['logs'].append(f"Найдено файлов результатов: {len(result_files)}")
-                        
-                        for result_file in result_files:
-                            try:
-                                with open(result_file, 'r') as f:
-                                    file_data = json.load(f)
-                                
-                                self._parse_swebench_report(file_data, instance_id, data, result)
-                                break  # Выходим после первого найденного результата
-                            except Exception as e:
-                                result['logs'].append(f"Ошибка чтения {result_file}: {e}")
-                    
-                    result['evaluation_success'] = len(result['errors']) == 0
-                    
+                    report_path = self._run_harness_with_retries(data, temp_dir, result)
+                    self._collect_report(report_path, temp_dir, data, result)
                 except Exception as e:
                     result['errors'].append(f"Ошибка SWE-bench evaluation: {e}")
                     logger.exception("SWE-bench evaluation error")
@@ -192,11 +539,24 @@ class SWEBenchValidator:
             elif instance_id in error_ids:
                 result['patch_applied'] = False
                 result['tests_passed'] = False
-                result['errors'].append(f"Instance {instance_id} завершился с ошибкой")
+                if result.get('failure_kind') == FAILURE_INFRA:
+                    result['errors'].append(
+                        f"Instance {instance_id}: инфраструктурный сбой "
+                        f"(повторов: {result.get('retries', 0)})"
+                    )
+                elif result.get('timed_out'):
+                    result['errors'].append(
+                        f"Instance {instance_id} превысил timeout ({result['timeout']} с)"
+                    )
+                else:
+                    result['errors'].append(f"Instance {instance_id} завершился с ошибкой")
             elif instance_id in completed_ids:
                 result['patch_applied'] = True
                 result['tests_passed'] = False
-                result['logs'].append(f"Instance {instance_id} completed, но не resolved")
+                result['errors'].append(
+                    f"Instance {instance_id} completed, но не resolved: "
+                    f"тесты не проходят с golden patch"
+                )
             else:
                 result['errors'].append(f"Instance {instance_id} не найден в результатах")
             
@@ -209,36 +569,34 @@ class SWEBenchValidator:
             result['errors'].append(f"Ошибка парсинга отчета: {e}")
             logger.exception("Report parsing error")
     
-    def validate_data_point(self, file_path: str, run_evaluation: bool = True) -> Dict[str, Any]:
-        """Валидирует одну точку данных SWE-bench."""
+    def check_data_point(self, file_path: str):
+        """
+        Загружает data point и проверяет его структуру.
+        
+        Returns:
+            (result, data) — data равно None, если data point не загрузился
+        """
         result = {
             'file': file_path,
             'valid': True,
             'errors': [],
             'warnings': [],
             'structure_valid': True,
+            'timed_out': False,
+            'failure_kind': None,
+            'retries': 0,
             'swe_bench_evaluation': None
         }
+        data = None
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = self.load_data_point(file_path)
             
             # 1. Проверка структуры JSON
             structure_errors = self.validate_json_structure(data)
             result['errors'].extend(structure_errors)
             result['structure_valid'] = len(structure_errors) == 0
             
-            # 2. SWE-bench evaluation
-            if run_evaluation and result['structure_valid']:
-                logger.info(f"Запускаем SWE-bench evaluation для {file_path}")
-                evaluation_result = self.run_swebench_evaluation(file_path)
-                result['swe_bench_evaluation'] = evaluation_result
-                
-                if not evaluation_result['evaluation_success']:
-                    result['errors'].extend(evaluation_result['errors'])
-            
-            # Финальный статус
             result['valid'] = len(result['errors']) == 0
             
         except json.JSONDecodeError as e:
@@ -249,36 +607,166 @@ class SWEBenchValidator:
             result['errors'].append(f"Ошибка валидации: {e}")
             result['valid'] = False
         
+        return result, data
+    
+    def _apply_evaluation(self, result: Dict[str, Any], evaluation_result: Dict[str, Any]):
+        """Переносит итог evaluation в результат валидации."""
+        result['swe_bench_evaluation'] = evaluation_result
+        result['timed_out'] = evaluation_result.get('timed_out', False)
+        result['failure_kind'] = evaluation_result.get('failure_kind')
+        result['retries'] = evaluation_result.get('retries', 0)
+        
+        if not evaluation_result['evaluation_success']:
+            result['errors'].extend(evaluation_result['errors'])
+        
+        # Финальный статус
+        result['valid'] = len(result['errors']) == 0
+    
+    def validate_data_point(self, file_path: str, run_evaluation: bool = True) -> Dict[str, Any]:
+        """Валидирует одну точку данных SWE-bench."""
+        result, data = self.check_data_point(file_path)
+        
+        # 2. SWE-bench evaluation
+        if run_evaluation and data is not None and result['structure_valid']:
+            logger.info(f"Запускаем SWE-bench evaluation для {file_path}")
+            self._apply_evaluation(result, self.run_swebench_evaluation(file_path))
+        
         return result
     
     def validate_batch(self, file_paths: List[str], run_evaluation: bool = True) -> Dict[str, Any]:
         """Валидирует пакет файлов."""
-        results = []
+        return asyncio.run(self.validate_batch_async(file_paths, run_evaluation))
+    
+    async def validate_batch_async(self, file_paths: List[str], run_evaluation: bool = True) -> Dict[str, Any]:
+        """
+        Валидирует пакет файлов конвейером asyncio стадий:
+        загрузка/структура -> подготовка image -> evaluation -> разбор отчета.
+        
+        Стадии связаны ограниченными очередями, блокирующие вызовы Docker и
+        harness уходят в executor, поэтому время пакета стремится к времени
+        самой медленной стадии, а не к сумме всех.
+        """
+        loop = asyncio.get_running_loop()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(file_paths)
+        
+        image_queue = asyncio.Queue(maxsize=2 * self.image_workers)
+        eval_queue = asyncio.Queue(maxsize=2 * self.eval_workers)
+        report_queue = asyncio.Queue(maxsize=2 * self.eval_workers)
+        
+        executor = ThreadPoolExecutor(
+            max_workers=self.image_workers + self.eval_workers,
+            thread_name_prefix='validator'
+        )
+        
+        async def load_stage():
+            for index, file_path in enumerate(file_paths):
+                logger.info(f"Валидируем {file_path}")
+                result, data = self.check_data_point(file_path)
+                
+                if run_evaluation and data is not None and result['structure_valid']:
+                    await image_queue.put({
+                        'index': index,
+                        'file': file_path,
+                        'data': data,
+                        'result': result,
+                        'evaluation': self._new_evaluation_result(),
+                        'temp_dir': None,
+                        'report_path': None,
+                        'harness_ok': False,
+                    })
+                else:
+                    results[index] = result
+            
+            for _ in range(self.image_workers):
+                await image_queue.put(None)
+        
+        async def image_step(item):
+            await loop.run_in_executor(
+                executor, self.ensure_instance_image, item['data'], item['evaluation']
+            )
+            return item
+        
+        async def eval_step(item):
+            evaluation = item['evaluation']
+            logger.info(f"Запускаем SWE-bench evaluation для {item['file']}")
+            
+            try:
+                item['temp_dir'] = Path(tempfile.mkdtemp(prefix='validator_'))
+                self._prepare_harness_inputs(item['data'], item['temp_dir'], evaluation)
+            except Exception as e:
+                evaluation['errors'].append(f"Ошибка подготовки evaluation: {e}")
+                logger.exception("Evaluation preparation error")
+                return item
+            
+            try:
+                item['report_path'] = await loop.run_in_executor(
+                    executor, self._run_harness_with_retries,
+                    item['data'], item['temp_dir'], evaluation
+                )
+                item['harness_ok'] = True
+            except Exception as e:
+                evaluation['errors'].append(f"Ошибка SWE-bench evaluation: {e}")
+                logger.error("SWE-bench evaluation error", exc_info=e)
+            return item
         
-        for file_path in file_paths:
-            logger.info(f"Валидируем {file_path}")
-            result = self.validate_data_point(file_path, run_evaluation)
-            results.append(result)
+        async def report_step(item):
+            evaluation = item['evaluation']
+            try:
+                if item['harness_ok']:
+                    self._collect_report(
+                        item['report_path'], item['temp_dir'], item['data'], evaluation
+                    )
+            except Exception as e:
+                evaluation['errors'].append(f"Ошибка SWE-bench evaluation: {e}")
+                logger.exception("SWE-bench evaluation error")
+            finally:
+                if item['temp_dir'] is not None:
+                    shutil.rmtree(item['temp_dir'], ignore_errors=True)
+            
+            self._apply_evaluation(item['result'], evaluation)
+            results[item['index']] = item['result']
+            return None
         
-        # Статистика
-        valid_count = sum(1 for r in results if r['valid'])
-        total_count = len(results)
+        try:
+            await asyncio.gather(
+                load_stage(),
+                self._run_stage(image_queue, eval_queue, image_step,
+                                self.image_workers, self.eval_workers),
+                self._run_stage(eval_queue, report_queue, eval_step,
+                                self.eval_workers, 1),
+                self._run_stage(report_queue, None, report_step, 1, 0),
+            )
+        finally:
+            executor.shutdown(wait=False)
         
         return {
             'results': results,
-            'summary': {
-                'total': total_count,
-                'valid': valid_count,
-                'invalid': total_count - valid_count,
-                'success_rate': valid_count / total_count if total_count > 0 else 0
-            }
+            'summary': summarize_results(results)
         }
+    
+    @staticmethod
+    async def _run_stage(inbox: asyncio.Queue, outbox: Optional[asyncio.Queue],
+                         step, workers: int, next_workers: int):
+        """Запускает workers обработчиков стадии; None в очереди — конец потока."""
+        async def worker():
+            while True:
+                item = await inbox.get()
+                if item is None:
+                    return
+                item = await step(item)
+                if item is not None and outbox is not None:
+                    await outbox.put(item)
+        
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        
+        if outbox is not None:
+            for _ in range(next_workers):
+                await outbox.put(None)
 
     def get_test_details(self, file_path: str) -> Dict[str, Any]:
         """Извлекает информацию о тестах из data point."""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = self.load_data_point(file_path)
             
             fail_to_pass = []
             pass_to_pass = []
@@ -303,13 +791,99 @@ class SWEBenchValidator:
             return {'fail_to_pass': [], 'pass_to_pass': [], 'error': str(e)}
 
 
+def print_result(validator: SWEBenchValidator, result: Dict[str, Any]):
+    """Печатает результат валидации одного data point."""
+    if result['valid']:
+        status = "✓ VALID"
+    elif result.get('timed_out'):
+        status = "⏱ TIMEOUT"
+    else:
+        status = "✗ INVALID"
+    print(f"{status}: {result['file']}")
+    
+    if result['errors']:
+        for error in result['errors']:
+            print(f"  ERROR: {error}")
+    
+    if result['swe_bench_evaluation']:
+        eval_result = result['swe_bench_evaluation']
+        print(f"  SWE-bench evaluation:")
+        print(f"    Patch applied: {'✓' if eval_result['patch_applied'] else '✗'}")
+        print(f"    Tests passed: {'✓' if eval_result['tests_passed'] else '✗'}")
+        if eval_result.get('timeout'):
+            runtime = eval_result.get('runtime')
+            runtime_text = f"{runtime:.0f} с" if runtime is not None else "?"
+            print(f"    Timeout: {eval_result['timeout']} с, время тестов: {runtime_text}")
+        if eval_result.get('failure_kind'):
+            kind = 'инфраструктура' if eval_result['failure_kind'] == FAILURE_INFRA else 'data point'
+            print(f"    Причина ошибки: {kind}")
+        if eval_result.get('retries'):
+            print(f"    Повторов: {eval_result['retries']}")
+        
+        test_details = validator.get_test_details(result['file'])
+        
+        if test_details['fail_to_pass']:
+            print(f"    FAIL_TO_PASS тесты ({len(test_details['fail_to_pass'])}):")
+            for test in test_details['fail_to_pass']:
+                # Для resolved instances все FAIL_TO_PASS должны пройти
+                test_status = "✓ PASS" if eval_result['tests_passed'] else "✗ FAIL"
+                print(f"      {test_status} {test}")
+        
+        if test_details['pass_to_pass']:
+            print(f"    PASS_TO_PASS тесты ({len(test_details['pass_to_pass'])}):")
+            for test in test_details['pass_to_pass']:
+                # Для resolved instances все PASS_TO_PASS должны пройти
+                test_status = "✓ PASS" if eval_result['tests_passed'] else "? UNKNOWN"
+                print(f"      {test_status} {test}")
+
+
+
 def main():
-    parser = argparse.ArgumentParser(description='SWE-bench Data Point Validator')
-    parser.add_argument('files', nargs='+', help='JSON файлы для валидации')
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        from validator_daemon import serve_main
+        serve_main(sys.argv[2:])
+        return
+    
+    parser = argparse.ArgumentParser(
+        description='SWE-bench Data Point Validator',
+        epilog='Режим демона: validator.py serve --help; '
+               'режим наблюдения: validator.py --watch data_points'
+    )
+    parser.add_argument('files', nargs='*',
+                       help='JSON файлы для валидации (или имена data points при --store)')
+    parser.add_argument('--store',
+                       help='Packed store (segment + index) вместо отдельных JSON файлов')
     parser.add_argument('--no-evaluation', action='store_true', 
                        help='Пропустить SWE-bench evaluation')
     parser.add_argument('--timeout', type=int, default=1800,
-                       help='Timeout для evaluation (секунды)')
+                       help='Timeout для evaluation (секунды); при истории — потолок')
+    parser.add_argument('--history', default=DEFAULT_HISTORY_PATH,
+                       help='Файл истории времени прогонов по (repo, version)')
+    parser.add_argument('--no-adaptive-timeout', action='store_true',
+                       help='Всегда использовать --timeout, не учитывая историю')
+    parser.add_argument('--max-retries', type=int, default=2,
+                       help='Повторов на instance при инфраструктурных сбоях')
+    parser.add_argument('--retry-budget', type=int, default=5,
+                       help='Общий лимит повторов на запуск')
+    parser.add_argument('--retry-backoff', type=float, default=30.0,
+                       help='Начальная задержка перед повтором (секунды)')
+    parser.add_argument('--eval-workers', type=int, default=1,
+                       help='Параллельных SWE-bench evaluation в пакете')
+    parser.add_argument('--image-workers', type=int, default=2,
+                       help='Параллельных подготовок Docker images в пакете')
+    parser.add_argument('--daemon', metavar='ADDRESS',
+                       help='Отправить job в демон валидатора '
+                            '(http://127.0.0.1:8765 или unix:/path/to.sock)')
+    parser.add_argument('--priority', type=int, default=0,
+                       help='Приоритет job в демоне (больше — раньше)')
+    parser.add_argument('--watch', metavar='DIR',
+                       help='Следить за каталогом и валидировать измененные файлы')
+    parser.add_argument('--debounce', type=float, default=0.3,
+                       help='Пауза после изменения файла в режиме --watch (секунды)')
+    parser.add_argument('--run-id', metavar='PREFIX',
+                       help='Префикс run_id harness (для поиска контейнеров прогона)')
+    parser.add_argument('--json-output', metavar='FILE',
+                       help='Записать результаты в JSON файл')
     parser.add_argument('--verbose', action='store_true',
                        help='Подробный вывод')
     parser.add_argument('--show-tests', action='store_true',
@@ -320,44 +894,73 @@ def main():
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
-    validator = SWEBenchValidator(timeout=args.timeout)
+    validator = SWEBenchValidator(
+        timeout=args.timeout, store_path=args.store,
+        eval_workers=args.eval_workers, image_workers=args.image_workers,
+        history=None if args.no_adaptive_timeout else RuntimeHistory(args.history),
+        max_retries=args.max_retries, retry_budget=args.retry_budget,
+        retry_backoff=args.retry_backoff,
+        run_id=args.run_id
+    )
+    
+    if args.watch:
+        from validator_watch import DataPointWatcher
+        
+        # Параметры evaluation передаются в дочерний validator.py
+        child_args = [
+            '--timeout', str(args.timeout),
+            '--max-retries', str(args.max_retries),
+            '--retry-budget', str(args.retry_budget),
+            '--retry-backoff', str(args.retry_backoff),
+        ]
+        if args.no_adaptive_timeout:
+            child_args.append('--no-adaptive-timeout')
+        else:
+            child_args.extend(['--history', str(Path(args.history).resolve())])
+        
+        DataPointWatcher(
+            validator, args.watch,
+            run_evaluation=not args.no_evaluation,
+            debounce=args.debounce,
+            eval_workers=args.eval_workers,
+            child_args=child_args,
+            verbose=args.verbose
+        ).run()
+        return
+    
+    files = args.files
+    if not files:
+        if validator.store is None:
+            parser.error('укажите JSON файлы, --store или --watch')
+        files = validator.store.ids()
     
     # Валидация
-    batch_result = validator.validate_batch(args.files, not args.no_evaluation)
+    if args.daemon:
+        from validator_daemon import ValidatorDaemonClient
+        client = ValidatorDaemonClient(args.daemon)
+        batch_result = client.validate_batch(
+            files, not args.no_evaluation,
+            timeout=args.timeout, priority=args.priority, store_path=args.store
+        )
+    else:
+        batch_result = validator.validate_batch(files, not args.no_evaluation)
+    
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump(batch_result, f, indent=2, ensure_ascii=False)
     
     # Вывод результатов
     for result in batch_result['results']:
-        status = "✓ VALID" if result['valid'] else "✗ INVALID"
-        print(f"{status}: {result['file']}")
-        
-        if result['errors']:
-            for error in result['errors']:
-                print(f"  ERROR: {error}")
-        
-        if result['swe_bench_evaluation']:
-            eval_result = result['swe_bench_evaluation']
-            print(f"  SWE-bench evaluation:")
-            print(f"    Patch applied: {'✓' if eval_result['patch_applied'] else '✗'}")
-            print(f"    Tests passed: {'✓' if eval_result['tests_passed'] else '✗'}")
-            
-            test_details = validator.get_test_details(result['file'])
-            
-            if test_details['fail_to_pass']:
-                print(f"    FAIL_TO_PASS тесты ({len(test_details['fail_to_pass'])}):")
-                for test in test_details['fail_to_pass']:
-                    # Для resolved instances все FAIL_TO_PASS должны пройти
-                    test_status = "✓ PASS" if eval_result['tests_passed'] else "✗ FAIL"
-                    print(f"      {test_status} {test}")
-            
-            if test_details['pass_to_pass']:
-                print(f"    PASS_TO_PASS тесты ({len(test_details['pass_to_pass'])}):")
-                for test in test_details['pass_to_pass']:
-                    # Для resolved instances все PASS_TO_PASS должны пройти
-                    test_status = "✓ PASS" if eval_result['tests_passed'] else "? UNKNOWN"
-                    print(f"      {test_status} {test}")
+        print_result(validator, result)
     
     # Общая статистика
     summary = batch_result['summary']
+    if summary.get('timed_out'):
+        print(f"Превысили timeout: {summary['timed_out']} из {summary['total']}")
+    if summary.get('infra_failures'):
+        print(f"Инфраструктурные сбои: {summary['infra_failures']} из {summary['total']}")
+    if summary.get('data_point_failures'):
+        print(f"Ошибки data points: {summary['data_point_failures']} из {summary['total']}")
     sys.exit(0 if summary['valid'] == summary['total'] else 1)
 
 
@@ -0,0 +1,614 @@
+#!/usr/bin/env python3
+"""
+Долгоживущий демон SWE-bench валидатора с локальным job API.
+
+Демон один раз импортирует swebench, подключается к Docker, держит список
+локальных images и кэш результатов, а validation jobs принимает по localhost
+HTTP или unix socket. Harness запускается в процессе демона; выполняющийся job
+отменяется удалением контейнеров его run_id:
+
+    POST   /jobs          {"files": [...], "run_evaluation": true,
+                           "timeout": 1800, "priority": 0, "store": null}
+    GET    /jobs/<id>     статус и результаты job
+    DELETE /jobs/<id>     отмена job
+    GET    /health        состояние демона
+
+Запуск:  python validator.py serve [--port 8765 | --socket /tmp/validator.sock]
+Клиент:  python validator.py --daemon http://127.0.0.1:8765 data_points/*.json
+"""
+
+import argparse
+import copy
+import hashlib
+import heapq
+import http.client
+import http.server
+import ipaddress
+import itertools
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from runtime_history import RuntimeHistory, DEFAULT_HISTORY_PATH
+from validator import SWEBenchValidator, summarize_results
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_FINISHED_JOBS = 200
+# Как часто при отмене job повторно удаляются контейнеры его прогона (секунды)
+CANCEL_POLL_INTERVAL = 1.0
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_CANCELLED = 'cancelled'
+JOB_FAILED = 'failed'
+
+FINAL_STATUSES = (JOB_DONE, JOB_CANCELLED, JOB_FAILED)
+
+
+class ValidationJob:
+    """Один запрос на валидацию пакета data points."""
+
+    def __init__(self, files: List[str], run_evaluation: bool = True,
+                 timeout: int = 1800, priority: int = 0,
+                 store_path: Optional[str] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.files = files
+        self.run_evaluation = run_evaluation
+        self.timeout = timeout
+        self.priority = priority
+        self.store_path = store_path
+        self.status = JOB_QUEUED
+        self.results: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.cancel_event = threading.Event()
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'priority': self.priority,
+            'files': self.files,
+            'run_evaluation': self.run_evaluation,
+            'timeout': self.timeout,
+            'store': self.store_path,
+            'progress': {'done': len(self.results), 'total': len(self.files)},
+            'results': self.results,
+            'summary': summarize_results(self.results),
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class ValidatorDaemon:
+    """Очередь validation jobs с приоритетами поверх прогретого SWEBenchValidator."""
+
+    def __init__(self, timeout: int = 1800, workers: int = 1,
+                 history: Optional[RuntimeHistory] = None,
+                 max_finished_jobs: int = MAX_FINISHED_JOBS):
+        self.timeout = timeout
+        self.workers = workers
+        self.history = history
+        self.max_finished_jobs = max_finished_jobs
+
+        self._jobs: Dict[str, ValidationJob] = {}
+        self._queue: List = []  # heap: (-priority, seq, job_id)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+        # Кэш результатов: хэш содержимого data point -> результат валидации
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._cache_lock = threading.Lock()
+
+        self.docker_client = None
+        self.image_tags: set = set()
+        self.started_at = time.time()
+
+    def warm_up(self):
+        """Импортирует swebench и подключается к Docker один раз на весь процесс."""
+        import swebench.harness.run_evaluation  # noqa: F401
+
+        try:
+            import docker
+            self.docker_client = docker.from_env()
+            self.docker_client.ping()
+            self.refresh_images()
+        except Exception as e:
+            logger.warning(f"Docker недоступен при прогреве демона: {e}")
+
+    def refresh_images(self):
+        """Обновляет закэшированный список локальных Docker images."""
+        if self.docker_client is None:
+            return
+        self.image_tags = {
+            tag for image in self.docker_client.images.list() for tag in image.tags
+        }
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker_loop, name=f"validator-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            for job in self._jobs.values():
+                job.cancel_event.set()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def submit(self, files: List[str], run_evaluation: bool = True,
+               timeout: Optional[int] = None, priority: int = 0,
+               store_path: Optional[str] = None) -> ValidationJob:
+        job = ValidationJob(
+            files, run_evaluation, timeout or self.timeout, priority, store_path
+        )
+        with self._cond:
+            self._jobs[job.id] = job
+            heapq.heappush(self._queue, (-priority, next(self._seq), job.id))
+            self._cond.notify()
+        logger.info(f"Job {job.id} принят: {len(files)} файлов, priority={priority}")
+        return job
+
+    def get(self, job_id: str) -> Optional[ValidationJob]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[ValidationJob]:
+        """
+        Отменяет job. Job из очереди снимается сразу, у выполняющегося
+        удаляются контейнеры текущего evaluation и не начинаются повторы.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINAL_STATUSES:
+                return job
+            job.cancel_event.set()
+            if job.status == JOB_QUEUED:
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+                self._evict_finished()
+        logger.info(f"Job {job_id} отменен")
+        return job
+
+    def health(self) -> Dict[str, Any]:
+        with self._cond:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            'status': 'ok',
+            'uptime': time.time() - self.started_at,
+            'docker': self.docker_client is not None,
+            'images': len(self.image_tags),
+            'cached_results': len(self._cache),
+            'jobs': {status: statuses.count(status) for status in set(statuses)},
+        }
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                _, _, job_id = heapq.heappop(self._queue)
+                job = self._jobs.get(job_id)
+                if job is None or job.status != JOB_QUEUED:
+                    continue  # Отменен, пока стоял в очереди
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+
+            try:
+                self._run_job(job)
+            except Exception as e:
+                job.error = str(e)
+                job.status = JOB_FAILED
+                logger.exception(f"Job {job.id} упал")
+            finally:
+                job.finished_at = time.time()
+                with self._cond:
+                    self._evict_finished()
+
+    def _evict_finished(self):
+        """Оставляет только последние max_finished_jobs завершенных jobs. Вызывать под self._cond."""
+        finished = [job for job in self._jobs.values() if job.status in FINAL_STATUSES]
+        if len(finished) <= self.max_finished_jobs:
+            return
+        finished.sort(key=lambda job: job.finished_at or 0)
+        for job in finished[:len(finished) - self.max_finished_jobs]:
+            del self._jobs[job.id]
+
+    def _run_job(self, job: ValidationJob):
+        # Docker client и список images демона переиспользуются всеми jobs;
+        # по run_id находятся контейнеры job при отмене
+        validator = SWEBenchValidator(
+            timeout=job.timeout, store_path=job.store_path, history=self.history,
+            docker_client=self.docker_client, known_images=self.image_tags,
+            run_id=f"daemon_{job.id}", cancel_event=job.cancel_event
+        )
+
+        try:
+            for file_path in job.files:
+                if job.cancel_event.is_set():
+                    job.status = JOB_CANCELLED
+                    return
+                logger.info(f"Job {job.id}: валидируем {file_path}")
+                result = self._validate_cached(validator, file_path, job)
+                if result is None:
+                    job.status = JOB_CANCELLED
+                    return
+                job.results.append(result)
+
+            job.status = JOB_DONE
+        finally:
+            validator.close()
+
+        if job.run_evaluation:
+            self.refresh_images()
+
+    def _cache_key(self, validator: SWEBenchValidator, file_path: str,
+                   job: ValidationJob) -> Optional[str]:
+        try:
+            data = validator.load_data_point(file_path)
+        except Exception:
+            return None
+        payload = json.dumps(
+            [data, job.run_evaluation, job.timeout], sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _validate_cached(self, validator: SWEBenchValidator, file_path: str,
+                         job: ValidationJob) -> Optional[Dict[str, Any]]:
+        """Результат валидации файла или None, если job отменен во время evaluation."""
+        key = self._cache_key(validator, file_path, job)
+        if key is not None:
+            with self._cache_lock:
+                cached = self._cache.get(key)
+            if cached is not None:
+                result = copy.deepcopy(cached)
+                result['file'] = file_path
+                result['cached'] = True
+                return result
+
+        result, data = validator.check_data_point(file_path)
+        if job.run_evaluation and data is not None and result['structure_valid']:
+            finished = threading.Event()
+            killer = threading.Thread(
+                target=self._remove_containers_on_cancel,
+                args=(validator, data['instance_id'], job, finished),
+                name=f"validator-cancel-{job.id}", daemon=True
+            )
+            killer.start()
+            try:
+                validator._apply_evaluation(
+                    result, validator.run_swebench_evaluation(file_path)
+                )
+            finally:
+                finished.set()
+                killer.join()
+            if job.cancel_event.is_set():
+                return None  # Результат прерванного evaluation не показателен
+
+        # Кэшируем только успешные результаты: ошибки могут быть временными
+        if key is not None and result['valid']:
+            with self._cache_lock:
+                self._cache[key] = copy.deepcopy(result)
+        return result
+
+    @staticmethod
+    def _remove_containers_on_cancel(validator: SWEBenchValidator, instance_id: str,
+                                     job: ValidationJob, finished: threading.Event):
+        """
+        Пока идет evaluation, после отмены job удаляет контейнеры его run_id.
+        Harness получает ошибку Docker и возвращается; удаление повторяется,
+        пока он не вернется, чтобы накрыть и контейнер, созданный после отмены.
+        """
+        while not finished.is_set():
+            if job.cancel_event.wait(CANCEL_POLL_INTERVAL):
+                validator.remove_run_containers(instance_id)
+                finished.wait(CANCEL_POLL_INTERVAL)
+
+
+class _JobRequestHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP обработчик job API. Демон берется из self.server.validator_daemon."""
+
+    def address_string(self) -> str:
+        # У unix socket client_address пустой
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return 'unix'
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_id(self) -> Optional[str]:
+        parts = self.path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'jobs':
+            return parts[1]
+        return None
+
+    def do_GET(self):
+        daemon = self.server.validator_daemon
+        if self.path.rstrip('/') == '/health':
+            self._send_json(200, daemon.health())
+            return
+        job = daemon.get(self._job_id() or '')
+        if job is None:
+            self._send_json(404, {'error': 'job не найден'})
+            return
+        self._send_json(200, job.to_dict())
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/jobs':
+            self._send_json(404, {'error': 'неизвестный путь'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError("тело запроса должно быть JSON объектом")
+
+            files = request.get('files')
+            if (not isinstance(files, list) or not files
+                    or not all(isinstance(f, str) for f in files)):
+                raise ValueError("files должен быть непустым списком строк")
+
+            run_evaluation = request.get('run_evaluation', True)
+            if not isinstance(run_evaluation, bool):
+                raise ValueError("run_evaluation должен быть bool")
+
+            timeout = request.get('timeout')
+            if timeout is not None and (
+                    isinstance(timeout, bool) or not isinstance(timeout, int) or timeout <= 0):
+                raise ValueError("timeout должен быть положительным целым")
+
+            priority = request.get('priority', 0)
+            if isinstance(priority, bool) or not isinstance(priority, int):
+                raise ValueError("priority должен быть целым")
+
+            store_path = request.get('store')
+            if store_path is not None and not isinstance(store_path, str):
+                raise ValueError("store должен быть строкой")
+        except (ValueError, TypeError) as e:
+            self._send_json(400, {'error': f"Невалидный запрос: {e}"})
+            return
+
+        job = self.server.validator_daemon.submit(
+            files,
+            run_evaluation=run_evaluation,
+            timeout=timeout,
+            priority=priority,
+            store_path=store_path,
+        )
+        self._send_json(202, job.to_dict())
+
+    def do_DELETE(self):
+        job = self.server.validator_daemon.cancel(self._job_id() or '')
+        if job is None:
+            self._send_json(404, {'error': 'job не найден'})
+            return
+        self._send_json(200, job.to_dict())
+
+
+class _TCPJobServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixJobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float = 30):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ValidatorDaemonClient:
+    """Тонкий клиент демона: отправляет job и ждет результат."""
+
+    def __init__(self, address: str, poll_interval: float = 2.0):
+        self.address = address
+        self.poll_interval = poll_interval
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self.address.startswith('unix:'):
+            return _UnixHTTPConnection(self.address[len('unix:'):])
+        parsed = urlparse(self.address if '://' in self.address else f"http://{self.address}")
+        return http.client.HTTPConnection(
+            parsed.hostname or DEFAULT_HOST, parsed.port or DEFAULT_PORT, timeout=30
+        )
+
+    def _request(self, method: str, path: str,
+                 payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        connection = self._connection()
+        try:
+            body = json.dumps(payload).encode('utf-8') if payload is not None else None
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = json.loads(response.read() or b'{}')
+            if response.status >= 400:
+                raise RuntimeError(f"Демон ответил {response.status}: {data.get('error')}")
+            return data
+        finally:
+            connection.close()
+
+    def health(self) -> Dict[str, Any]:
+        return self._request('GET', '/health')
+
+    def submit(self, files: List[str], run_evaluation: bool = True,
+               timeout: Optional[int] = None, priority: int = 0,
+               store_path: Optional[str] = None) -> Dict[str, Any]:
+        return self._request('POST', '/jobs', {
+            'files': files,
+            'run_evaluation': run_evaluation,
+            'timeout': timeout,
+            'priority': priority,
+            'store': store_path,
+        })
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        return self._request('GET', f'/jobs/{job_id}')
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        return self._request('DELETE', f'/jobs/{job_id}')
+
+    def validate_batch(self, file_paths: List[str], run_evaluation: bool = True,
+                       timeout: Optional[int] = None, priority: int = 0,
+                       store_path: Optional[str] = None) -> Dict[str, Any]:
+        """Аналог SWEBenchValidator.validate_batch, выполняемый в демоне."""
+        # Демон может работать в другом cwd: передаем абсолютные пути
+        remote_paths = [
+            str(Path(p).resolve()) if Path(p).exists() else p for p in file_paths
+        ]
+        if store_path:
+            store_path = str(Path(store_path).resolve())
+
+        job = self.submit(remote_paths, run_evaluation, timeout, priority, store_path)
+        logger.info(f"Job {job['id']} отправлен в демон {self.address}")
+
+        try:
+            while job['status'] not in FINAL_STATUSES:
+                time.sleep(self.poll_interval)
+                job = self.get(job['id'])
+        except KeyboardInterrupt:
+            self.cancel(job['id'])
+            raise
+
+        if job['status'] == JOB_FAILED:
+            raise RuntimeError(f"Job {job['id']} упал в демоне: {job['error']}")
+
+        results = job['results']
+        for result, original_path in zip(results, file_paths):
+            result['file'] = original_path
+
+        # Отмененный job (в том числе при остановке демона) не должен выглядеть
+        # успешным: непроверенные файлы попадают в результаты как невалидные
+        if job['status'] == JOB_CANCELLED:
+            skipped = file_paths[len(results):]
+            logger.warning(f"Job {job['id']} отменен в демоне, не проверено файлов: {len(skipped)}")
+            results.extend(_cancelled_result(path) for path in skipped)
+
+        return {'results': results, 'summary': summarize_results(results)}
+
+
+def _cancelled_result(file_path: str) -> Dict[str, Any]:
+    return {
+        'file': file_path,
+        'valid': False,
+        'errors': ['Job отменен в демоне, файл не проверен'],
+        'warnings': [],
+        'structure_valid': False,
+        'timed_out': False,
+        'failure_kind': None,
+        'retries': 0,
+        'cancelled': True,
+        'swe_bench_evaluation': None,
+    }
+
+
+def _is_loopback(host: str) -> bool:
+    try:
+        return all(
+            ipaddress.ip_address(info[4][0]).is_loopback
+            for info in socket.getaddrinfo(host, None)
+        )
+    except (socket.gaierror, ValueError):
+        return False
+
+
+def serve_main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog='validator.py serve',
+        description='Демон SWE-bench валидатора с локальным job API'
+    )
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                       help='Адрес для HTTP (только loopback)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                       help='Порт для HTTP')
+    parser.add_argument('--socket', help='Слушать unix socket вместо HTTP порта')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Количество параллельных jobs')
+    parser.add_argument('--timeout', type=int, default=1800,
+                       help='Timeout для evaluation по умолчанию (секунды); при истории — потолок')
+    parser.add_argument('--history', default=DEFAULT_HISTORY_PATH,
+                       help='Файл истории времени прогонов по (repo, version)')
+    parser.add_argument('--no-adaptive-timeout', action='store_true',
+                       help='Всегда использовать timeout job, не учитывая историю')
+    parser.add_argument('--verbose', action='store_true',
+                       help='Подробный вывод')
+
+    parser.add_argument('--max-finished-jobs', type=int, default=MAX_FINISHED_JOBS,
+                       help='Сколько завершенных jobs хранить для GET /jobs/<id>')
+
+    args = parser.parse_args(argv)
+
+    # API читает произвольные пути на сервере: наружу его не открываем
+    if not args.socket and not _is_loopback(args.host):
+        parser.error(f"--host должен быть loopback адресом, получено: {args.host}")
+
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    history = None if args.no_adaptive_timeout else RuntimeHistory(args.history)
+    daemon = ValidatorDaemon(
+        timeout=args.timeout, workers=args.workers, history=history,
+        max_finished_jobs=args.max_finished_jobs
+    )
+    daemon.warm_up()
+    daemon.start()
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        server = _UnixJobServer(args.socket, _JobRequestHandler)
+        address = f"unix:{args.socket}"
+    else:
+        server = _TCPJobServer((args.host, args.port), _JobRequestHandler)
+        address = f"http://{args.host}:{server.server_address[1]}"
+    server.validator_daemon = daemon
+
+    logger.info(f"Демон валидатора слушает {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Останавливаем демон...")
+    finally:
+        server.server_close()
+        daemon.stop()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
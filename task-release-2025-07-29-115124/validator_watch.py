@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Режим наблюдения: инкрементальная валидация data points при изменении файлов.
+
+После паузы (debounce) структура измененного файла проверяется сразу,
+а SWE-bench evaluation ставится в очередь только если поменялись поля,
+влияющие на evaluation. Evaluation идет в отдельном процессе validator.py,
+поэтому при повторной правке файла незавершенный прогон можно прервать.
+
+Уведомления файловой системы берутся из watchdog (pip install watchdog),
+без него используется опрос mtime.
+
+Запуск:  python validator.py --watch data_points
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+from validator import SWEBenchValidator, print_result, FAILURE_INFRA, VALIDATOR_SCRIPT
+
+logger = logging.getLogger(__name__)
+
+# Поля data point, от которых зависит результат SWE-bench evaluation
+EVALUATION_FIELDS = (
+    'instance_id', 'repo', 'version', 'base_commit', 'environment_setup_commit',
+    'patch', 'test_patch', 'FAIL_TO_PASS', 'PASS_TO_PASS',
+)
+
+# События watchdog, после которых содержимое файла могло измениться.
+# 'opened' и 'closed_no_write' порождает само чтение файла при проверке.
+CONTENT_EVENTS = frozenset({'modified', 'created', 'moved', 'deleted', 'closed'})
+
+
+def evaluation_key(data: Dict[str, Any]) -> str:
+    """Хэш полей, влияющих на evaluation."""
+    relevant = {field: data.get(field) for field in EVALUATION_FIELDS}
+    payload = json.dumps(relevant, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _EventForwarder(FileSystemEventHandler):
+    """Передает события watchdog из его потока в asyncio очередь."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self.loop = loop
+        self.queue = queue
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in CONTENT_EVENTS:
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            if path and str(path).endswith('.json'):
+                self.loop.call_soon_threadsafe(self.queue.put_nowait, Path(path))
+
+
+class DataPointWatcher:
+    """Следит за каталогом data points и валидирует измененные файлы."""
+
+    def __init__(self, validator: SWEBenchValidator, directory: str,
+                 run_evaluation: bool = True, debounce: float = 0.3,
+                 eval_workers: int = 1, child_args: Optional[List[str]] = None,
+                 poll_interval: float = 0.5, verbose: bool = False):
+        self.validator = validator
+        self.directory = Path(directory).resolve()
+        self.run_evaluation = run_evaluation
+        self.debounce = debounce
+        self.child_args = child_args or []
+        self.poll_interval = poll_interval
+        self.verbose = verbose
+        self.eval_workers = max(1, eval_workers)
+
+        self._debounce_tasks: Dict[Path, asyncio.Task] = {}
+        self._eval_tasks: Dict[Path, asyncio.Task] = {}
+        # Ключ evaluation, который уже проверен или сейчас проверяется
+        self._eval_keys: Dict[Path, str] = {}
+        # (mtime_ns, size) файла на момент последней проверки
+        self._stats: Dict[Path, Tuple[int, int]] = {}
+
+    def run(self):
+        try:
+            asyncio.run(self._run())
+        except KeyboardInterrupt:
+            print("Наблюдение остановлено")
+
+    def _data_point_files(self) -> List[Path]:
+        return sorted(p for p in self.directory.rglob('*.json') if not p.name.startswith('.'))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(self.eval_workers)
+
+        self._check_existing()
+        stop_source = self._start_event_source(loop)
+        print(f"Наблюдаем за {self.directory} (Ctrl+C для выхода)")
+
+        try:
+            while True:
+                path = await self._events.get()
+                if path.name.startswith('.'):
+                    continue  # Временные файлы редакторов
+                self._schedule(path.resolve())
+        finally:
+            stop_source()
+            for task in [*self._debounce_tasks.values(), *self._eval_tasks.values()]:
+                task.cancel()
+
+    def _check_existing(self):
+        """Проверяет структуру текущих файлов и запоминает их как исходное состояние."""
+        files = self._data_point_files()
+        invalid = 0
+        for path in files:
+            self._stats[path] = self._stat(path)
+            result, data = self.validator.check_data_point(str(path))
+            if not result['structure_valid'] or data is None:
+                invalid += 1
+                self._print_structure(path, result)
+            else:
+                self._eval_keys[path] = evaluation_key(data)
+        print(f"Найдено data points: {len(files)}, с ошибками структуры: {invalid}")
+
+    def _start_event_source(self, loop: asyncio.AbstractEventLoop):
+        if Observer is not None:
+            observer = Observer()
+            observer.schedule(_EventForwarder(loop, self._events), str(self.directory), recursive=True)
+            observer.start()
+
+            def stop():
+                observer.stop()
+                observer.join()
+            return stop
+
+        logger.info(f"watchdog не установлен, опрашиваем каталог каждые {self.poll_interval} с")
+        poller = asyncio.create_task(self._poll())
+        return poller.cancel
+
+    @staticmethod
+    def _stat(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for path in self._data_point_files():
+            stat = self._stat(path)
+            if stat is not None:
+                snapshot[path] = stat
+        return snapshot
+
+    async def _poll(self):
+        previous = self._snapshot()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = self._snapshot()
+            for path in previous.keys() | current.keys():
+                if previous.get(path) != current.get(path):
+                    self._events.put_nowait(path)
+            previous = current
+
+    def _schedule(self, path: Path):
+        """Перезапускает debounce таймер файла."""
+        pending = self._debounce_tasks.pop(path, None)
+        if pending is not None:
+            pending.cancel()
+        self._debounce_tasks[path] = asyncio.create_task(self._debounced(path))
+
+    async def _debounced(self, path: Path):
+        await asyncio.sleep(self.debounce)
+        self._debounce_tasks.pop(path, None)
+        self._process(path)
+
+    def _print_structure(self, path: Path, result: Dict[str, Any]):
+        if result['structure_valid'] and result['valid']:
+            print(f"✓ Структура OK: {path}")
+            return
+        print(f"✗ Ошибки структуры: {path}")
+        for error in result['errors']:
+            print(f"  ERROR: {error}")
+
+    def _process(self, path: Path):
+        stat = self._stat(path)
+        if stat is None:
+            if self._stats.pop(path, None) is None and path not in self._eval_tasks:
+                return  # Уже обработан как удаленный
+            self._cancel_evaluation(path)
+            self._eval_keys.pop(path, None)
+            print(f"Удален: {path}")
+            return
+
+        # Файл не менялся с последней проверки (например, событие от чтения)
+        if self._stats.get(path) == stat:
+            return
+        self._stats[path] = stat
+
+        # 1. Структура — сразу
+        result, data = self.validator.check_data_point(str(path))
+        self._print_structure(path, result)
+
+        if not result['structure_valid'] or data is None:
+            self._cancel_evaluation(path)
+            self._eval_keys.pop(path, None)
+            return
+
+        if not self.run_evaluation:
+            return
+
+        # 2. Evaluation — только если изменилось то, что на него влияет
+        key = evaluation_key(data)
+        if self._eval_keys.get(path) == key:
+            print(f"  Изменения не влияют на evaluation, пропускаем")
+            return
+
+        self._cancel_evaluation(path)
+        self._eval_keys[path] = key
+        self._eval_tasks[path] = asyncio.create_task(
+            self._evaluate(path, data['instance_id'])
+        )
+        print(f"  Evaluation поставлен в очередь")
+
+    def _cancel_evaluation(self, path: Path):
+        task = self._eval_tasks.pop(path, None)
+        if task is not None and not task.done():
+            task.cancel()
+            print(f"  Отменяем незавершенный evaluation: {path}")
+
+    async def _evaluate(self, path: Path, instance_id: str):
+        current = asyncio.current_task()
+        try:
+            async with self._semaphore:
+                print(f"Запускаем SWE-bench evaluation: {path}")
+                batch_result = await self._run_child(path, instance_id)
+
+            for result in batch_result['results']:
+                print_result(self.validator, result)
+                # Инфраструктурный сбой не говорит о содержимом: при следующем
+                # сохранении файла evaluation надо повторить
+                if result.get('failure_kind') == FAILURE_INFRA:
+                    self._eval_keys.pop(path, None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"✗ Evaluation не выполнен для {path}: {e}")
+            self._eval_keys.pop(path, None)
+        finally:
+            if self._eval_tasks.get(path) is current:
+                del self._eval_tasks[path]
+
+    async def _run_child(self, path: Path, instance_id: str) -> Dict[str, Any]:
+        """Запускает validator.py для одного файла в отдельном процессе."""
+        # Свой префикс run_id, чтобы при отмене удалить контейнеры только этого прогона
+        run_id = f"watch_{uuid.uuid4().hex[:8]}"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_file = Path(temp_dir) / 'result.json'
+            output = None if self.verbose else subprocess.DEVNULL
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, str(VALIDATOR_SCRIPT),
+                '--json-output', str(output_file), *self.child_args,
+                '--run-id', run_id, str(path),
+                stdout=output, stderr=output,
+            )
+
+            try:
+                await proc.wait()
+            except asyncio.CancelledError:
+                proc.terminate()
+                try:
+                    await asyncio.wait_for(proc.wait(), timeout=10)
+                except asyncio.TimeoutError:
+                    proc.kill()
+                    await proc.wait()
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.validator.remove_run_containers, instance_id, run_id
+                )
+                raise
+
+            with open(output_file, 'r', encoding='utf-8') as f:
+                return json.load(f)